@@ -2,12 +2,26 @@ import re
 import requests
 import json
 import os
+import math
+import sys
+import socket
+import sqlite3
 import logging
+import threading
+import time
+import random
+import cProfile
+import contextvars
+import unicodedata
+import bisect
+import itertools
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from flask import Flask, render_template_string
+from flask import Flask, render_template_string, request, jsonify, g
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
@@ -19,6 +33,184 @@ current_gold_data = []
 HISTORY_FILE = "btmc_history.json"
 HISTORY_DAYS = 7
 
+# Cấu hình cho API chuỗi thời gian (biểu đồ)
+# Các khoảng thời gian có tên và các mức số điểm được tính sẵn; from/to tuỳ ý được tính theo yêu cầu
+SERIES_RANGES = {"24h": 24 * 3600, "7d": 7 * 24 * 3600}
+SERIES_POINT_BUDGETS = (100, 250, 500, 1000, 2000)
+SERIES_DEFAULT_POINTS = 500
+SERIES_REFRESH_SECONDS = 60
+PRICE_KEYS = {"buy": "Mua vào", "sell": "Bán ra"}
+
+# Các cửa sổ thống kê trượt (cao/thấp/trung bình/biến động) cho từng loại vàng
+STATS_WINDOWS = {"24h": 24 * 3600, "7d": 7 * 24 * 3600}
+
+# Cấu hình chế độ cào phân tán: CRAWL_MODE="local" (một scheduler) hoặc "farm" (nhiều worker dùng chung bảng job)
+CRAWL_MODE = os.environ.get("CRAWL_MODE", "local")
+
+# Cấu hình bộ nhớ đệm kết quả cào dữ liệu
+# CRAWL_CACHE_BACKEND: "memory" (LRU trong process), "file" hoặc "redis" (dùng chung giữa nhiều process).
+# Chế độ farm mặc định dùng "file" và không chấp nhận "memory" vì web phải đọc được dữ liệu do worker cào
+CRAWL_CACHE_TTL = int(os.environ.get("CRAWL_CACHE_TTL", "300"))
+CRAWL_CACHE_BACKEND = os.environ.get("CRAWL_CACHE_BACKEND", "file" if CRAWL_MODE == "farm" else "memory")
+CRAWL_CACHE_FILE = os.environ.get("CRAWL_CACHE_FILE", "btmc_crawl_cache.json")
+CRAWL_CACHE_REDIS_URL = os.environ.get("CRAWL_CACHE_REDIS_URL", "redis://localhost:6379/0")
+CRAWL_CACHE_BACKENDS = ("memory", "file", "redis")
+CRAWL_CACHE_KEY = "BTMC"
+
+# Cấu hình cho chế độ farm
+BTMC_URL = os.environ.get("BTMC_URL", "https://giavang.org/trong-nuoc/bao-tin-minh-chau/")
+FARM_DB_FILE = os.environ.get("FARM_DB_FILE", "btmc_farm.db")
+FARM_LEASE_SECONDS = int(os.environ.get("FARM_LEASE_SECONDS", "30"))
+FARM_HEARTBEAT_SECONDS = int(os.environ.get("FARM_HEARTBEAT_SECONDS", "10"))
+FARM_CRAWL_INTERVAL = int(os.environ.get("FARM_CRAWL_INTERVAL", "14400"))
+FARM_RETRY_SECONDS = int(os.environ.get("FARM_RETRY_SECONDS", "60"))
+FARM_POLL_SECONDS = float(os.environ.get("FARM_POLL_SECONDS", "1"))
+
+# Nhật ký sự kiện thay đổi giá sau mỗi lần cào (JSON Lines, mỗi dòng một sự kiện có số thứ tự)
+EVENT_LOG_FILE = os.environ.get("EVENT_LOG_FILE", "btmc_events.jsonl")
+EVENT_LOG_MEMORY = 1000
+EVENT_PAGE_SIZE = 100
+# Cứ mỗi EVENT_INDEX_STRIDE sự kiện lưu một vị trí byte trong file để đọc lại sự kiện cũ mà không quét cả file
+EVENT_INDEX_STRIDE = 100
+
+# Cấu hình profiling (mặc định tắt): ghi lại các request/job chậm hơn ngưỡng dưới dạng
+# collapsed stack (.folded) dùng trực tiếp cho flamegraph.pl/speedscope, kèm file .prof khi lấy mẫu cProfile
+PROFILE_ENABLED = os.environ.get("PROFILE_ENABLED", "0") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_THRESHOLD_MS = float(os.environ.get("PROFILE_THRESHOLD_MS", "500"))
+PROFILE_CPROFILE_RATE = float(os.environ.get("PROFILE_CPROFILE_RATE", "0"))
+# Giới hạn để profiling có thể bật lâu dài: số lần ghi mỗi phút trong một process và số file tối đa trong PROFILE_DIR
+PROFILE_MAX_PER_MINUTE = int(os.environ.get("PROFILE_MAX_PER_MINUTE", "10"))
+PROFILE_MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "200"))
+
+# Trace đang chạy trong ngữ cảnh hiện tại (request hoặc job), None khi không profiling
+_current_trace = contextvars.ContextVar("profile_trace", default=None)
+
+# Thời điểm các lần ghi profile trong 60 giây gần nhất
+_profile_writes = deque()
+# Số thứ tự file trong process: id(trace) có thể bị dùng lại sau khi trace cũ được giải phóng
+_profile_counter = itertools.count(1)
+_profile_lock = threading.Lock()
+
+# Ký tự ";" ngăn cách frame và ký tự điều khiển (xuống dòng trong URL đã giải mã) làm hỏng định dạng folded
+_FOLDED_ESCAPES = {i: f"\\x{i:02x}" for i in range(32)}
+_FOLDED_ESCAPES[ord(";")] = ":"
+_FOLDED_ESCAPES[0x7f] = "\\x7f"
+
+def _folded_frame(name):
+    return name.translate(_FOLDED_ESCAPES)
+
+def _profile_write_allowed(now):
+    with _profile_lock:
+        while _profile_writes and _profile_writes[0] <= now - 60:
+            _profile_writes.popleft()
+        if len(_profile_writes) >= PROFILE_MAX_PER_MINUTE:
+            return False
+        _profile_writes.append(now)
+        return True
+
+def _profile_mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        # File vừa bị process khác xoá
+        return 0
+
+def _prune_profiles():
+    # Xoá các file cũ nhất khi PROFILE_DIR vượt quá PROFILE_MAX_FILES (dùng chung giữa các process)
+    paths = [os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)
+             if name.endswith((".folded", ".prof"))]
+    if len(paths) <= PROFILE_MAX_FILES:
+        return
+    paths.sort(key=_profile_mtime)
+    for path in paths[:len(paths) - PROFILE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class ProfileTrace:
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = _folded_frame(name)
+        self.stack = [self.name]
+        self.spans = []
+        self.profiler = None
+        if PROFILE_CPROFILE_RATE and random.random() < PROFILE_CPROFILE_RATE:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self.profiler = profiler
+            except ValueError:
+                # Đã có profiler khác đang chạy, bỏ qua lần lấy mẫu này
+                pass
+        self.start = time.perf_counter()
+
+    def finish(self):
+        elapsed = time.perf_counter() - self.start
+        if self.profiler is not None:
+            self.profiler.disable()
+        if elapsed * 1000 >= PROFILE_THRESHOLD_MS:
+            if not _profile_write_allowed(time.time()):
+                logger.warning(f"{self.kind} '{self.name}' chậm: {elapsed * 1000:.0f} ms, "
+                               f"bỏ qua ghi profile (quá {PROFILE_MAX_PER_MINUTE} lần/phút)")
+                return elapsed
+            try:
+                self._write(elapsed)
+                _prune_profiles()
+            except OSError as e:
+                logger.error(f"Lỗi khi ghi kết quả profiling: {str(e)}")
+        return elapsed
+
+    def _write(self, elapsed):
+        totals = {(self.name,): elapsed}
+        for path, duration in self.spans:
+            totals[path] = totals.get(path, 0) + duration
+        # Flamegraph cần thời gian riêng của từng frame, không tính các span con
+        children = {}
+        for path, duration in totals.items():
+            if len(path) > 1:
+                children[path[:-1]] = children.get(path[:-1], 0) + duration
+
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        base = os.path.join(PROFILE_DIR, f"{self.kind}-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{next(_profile_counter)}")
+        with open(base + ".folded", "w", encoding="utf-8") as f:
+            for path, duration in totals.items():
+                self_us = int(max(duration - children.get(path, 0), 0) * 1000000)
+                if self_us:
+                    f.write(f"{';'.join(_folded_frame(frame) for frame in path)} {self_us}\n")
+        if self.profiler is not None:
+            self.profiler.dump_stats(base + ".prof")
+        logger.warning(f"{self.kind} '{self.name}' chậm: {elapsed * 1000:.0f} ms, đã ghi profile vào {base}.folded")
+
+@contextmanager
+def span(name):
+    # Đo thời gian một giai đoạn; gần như không tốn chi phí khi không có trace
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    trace.stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.spans.append((tuple(trace.stack), time.perf_counter() - start))
+        trace.stack.pop()
+
+@contextmanager
+def traced(kind, name):
+    if not PROFILE_ENABLED:
+        yield
+        return
+    trace = ProfileTrace(kind, name)
+    token = _current_trace.set(trace)
+    try:
+        yield
+    finally:
+        _current_trace.reset(token)
+        trace.finish()
+
 # Khai báo class GoldPriceScheduler để quản lý việc lên lịch tự động
 class GoldPriceScheduler:
     def __init__(self, crawl_function, update_function):
@@ -55,15 +247,22 @@ class GoldPriceScheduler:
             logger.info("Scheduler đã dừng")
 
     def _fetch_and_update_data(self):
-        try:
-            logger.info("Bắt đầu cào dữ liệu giá vàng...")
-            global current_gold_data
-            data = self.crawl_function()
-            current_gold_data = data
-            self.update_function(data)
-            logger.info(f"Đã cập nhật thành công dữ liệu giá vàng. Số bản ghi: {len(data)}")
-        except Exception as e:
-            logger.error(f"Lỗi khi cập nhật dữ liệu giá vàng: {str(e)}")
+        with traced("job", "fetch_gold_price"):
+            try:
+                logger.info("Bắt đầu cào dữ liệu giá vàng...")
+                global current_gold_data
+                with span("crawl"):
+                    data = self.crawl_function()
+                current_gold_data = data
+                crawl_cache.set(CRAWL_CACHE_KEY, data)
+                with span("persist"):
+                    self.update_function(data)
+                with span("diff"):
+                    event = record_snapshot(CRAWL_CACHE_KEY, data)
+                logger.info(f"Đã ghi sự kiện #{event['seq']}: {event['summary']}")
+                logger.info(f"Đã cập nhật thành công dữ liệu giá vàng. Số bản ghi: {len(data)}")
+            except Exception as e:
+                logger.error(f"Lỗi khi cập nhật dữ liệu giá vàng: {str(e)}")
 
 def make_session(retries=3, backoff_factor=0.3, status_forcelist=(500,502,504)):
     s = requests.Session()
@@ -75,29 +274,230 @@ def make_session(retries=3, backoff_factor=0.3, status_forcelist=(500,502,504)):
     s.mount("http://", adapter)
     return s
 
-def parse_price_from_text(text):
+# Bản ghi giá vàng gọn nhẹ: dùng __slots__, mã đại lý/loại vàng được intern,
+# chuỗi thời gian hiển thị chỉ được định dạng khi render thay vì lưu kèm mỗi bản ghi
+class GoldRecord:
+    __slots__ = ("dealer", "type", "timestamp", "buy", "sell")
+
+    # Ánh xạ khóa của định dạng dict cũ sang thuộc tính để template và code cũ vẫn dùng được item['...']
+    _FIELDS = {"dealer": "dealer", "type": "type", "timestamp": "timestamp", "Mua vào": "buy", "Bán ra": "sell"}
+
+    def __init__(self, dealer, gold_type, timestamp, buy, sell):
+        self.dealer = sys.intern(dealer)
+        self.type = sys.intern(gold_type)
+        self.timestamp = timestamp
+        self.buy = buy
+        self.sell = sell
+
+    @classmethod
+    def from_dict(cls, item):
+        return cls(item.get("dealer", "BTMC"), item["type"], item["timestamp"],
+                   item.get("Mua vào"), item.get("Bán ra"))
+
+    @property
+    def time(self):
+        return datetime.fromtimestamp(self.timestamp).strftime("%d/%m/%Y %H:%M:%S")
+
+    def __getitem__(self, key):
+        if key == "time":
+            return self.time
+        return getattr(self, self._FIELDS[key])
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def _key(self):
+        return (self.dealer, self.type, self.timestamp, self.buy, self.sell)
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            # Dict thiếu khóa hoặc sai kiểu không thể là cùng một bản ghi
+            try:
+                other = GoldRecord.from_dict(other)
+            except (KeyError, TypeError):
+                return NotImplemented
+        if not isinstance(other, GoldRecord):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        return f"GoldRecord({self.dealer!r}, {self.type!r}, {self.timestamp!r}, {self.buy!r}, {self.sell!r})"
+
+    def to_dict(self):
+        # Giữ nguyên định dạng file lịch sử/JSON cũ
+        return {
+            "dealer": self.dealer,
+            "type": self.type,
+            "time": self.time,
+            "timestamp": self.timestamp,
+            "Mua vào": self.buy,
+            "Bán ra": self.sell
+        }
+
+def as_record(item):
+    if isinstance(item, GoldRecord):
+        return item
+    return GoldRecord.from_dict(item)
+
+def record_to_json(obj):
+    # Dùng làm tham số default cho json.dump
+    if isinstance(obj, GoldRecord):
+        return obj.to_dict()
+    raise TypeError(f"Không thể chuyển {type(obj).__name__} sang JSON")
+
+# Chuẩn hoá giá về VNĐ/lượng. Cú pháp được nhận dạng (đơn vị đứng ngay sau con số):
+#   <số> [x<hệ số> | <hệ số> trước đ/VNĐ] [triệu|tr|nghìn|ngàn|k] [đ|đồng|VNĐ] [/chỉ|/lượng|/cây]
+# Ví dụ: "133.100", "13.310.000 đ/lượng", "1.331 triệu", "133.100 x1000đ/lượng", "13,31 triệu/chỉ"
+# Dấu phân cách theo cách viết tiếng Việt:
+#   - "." trước nhóm đúng 3 chữ số luôn là phân cách hàng nghìn, với mọi đơn vị ("1.331 triệu" = 1.331.000.000);
+#     "." chỉ là dấu thập phân khi không thể là phân cách hàng nghìn ("1.5 triệu")
+#   - "," là dấu thập phân khi đơn vị là triệu ("13,31 triệu", "1,331 triệu"). Với nghìn đồng/đồng phần lẻ
+#     không có nghĩa nên "," trước nhóm 3 chữ số là phân cách hàng nghìn kiểu tiếng Anh ("133,100")
+#   - Có cả hai dấu: dấu xuất hiện sau cùng là dấu thập phân ("1.331,5" và "1,331.5")
+_PRICE_NUMBER = r'[0-9][0-9.,]*'
+_PRICE_MULTIPLIER_WORDS = r'triệu|trieu|tr|nghìn|nghin|ngàn|ngan|k'
+_PRICE_CURRENCY_WORDS = r'vnđ|vnd|đồng|dong|đ'
+_PRICE_WEIGHT_WORDS = r'chỉ|chi|lượng|luong|cây|cay'
+_PRICE_NUMBER_RE = re.compile(_PRICE_NUMBER)
+_PRICE_UNIT_RE = re.compile(
+    rf'\s*(?:[x×]\s*({_PRICE_NUMBER})|({_PRICE_NUMBER})(?=\s*(?:{_PRICE_CURRENCY_WORDS})\b))?'
+    rf'\s*(?:({_PRICE_MULTIPLIER_WORDS})\b)?'
+    rf'\s*(?:({_PRICE_CURRENCY_WORDS})\b)?'
+    rf'(?:\s*/\s*({_PRICE_WEIGHT_WORDS})\b)?'
+)
+_PRICE_NUMBER_CHARS = '0123456789.,'
+_PRICE_MULTIPLIERS = {
+    "triệu": 1000000, "trieu": 1000000, "tr": 1000000,
+    "nghìn": 1000, "nghin": 1000, "ngàn": 1000, "ngan": 1000, "k": 1000,
+}
+# 1 lượng (cây) = 10 chỉ
+_PRICE_WEIGHTS = {"chỉ": 10, "chi": 10, "lượng": 1, "luong": 1, "cây": 1, "cay": 1}
+# Trang nguồn niêm yết giá theo nghìn đồng/lượng: số không kèm đơn vị luôn được nhân 1000
+_PRICE_DEFAULT_MULTIPLIER = 1000
+# Giá chỉ ghi "đ"/"VNĐ" (không có nghìn/triệu/x1000) mà sau khi quy ra lượng vẫn nhỏ hơn ngưỡng này là cách viết tắt
+# theo nghìn đồng, ví dụ "133.100 VNĐ/lượng". Hàm không đơn điệu tại ngưỡng (999.999đ -> 999.999.000,
+# 1.000.000đ -> 1.000.000), nhưng giá vàng thật luôn lớn hơn 1 triệu đồng nên vùng này không chứa giá hợp lệ
+PRICE_THOUSANDS_FLOOR = 1000000
+_PRICE_UNIT_CACHE_SIZE = 1024
+
+# Bảng phân tích phần đơn vị đứng sau con số. Tập đơn vị rất nhỏ nên mỗi chuỗi đơn vị chỉ phân tích
+# một lần; con số luôn được phân tích lại nên đây không phải cache kết quả
+_price_units = {}
+
+def _parse_price_number(token, decimal_comma):
+    if token[-1] in '.,':
+        token = token.rstrip('.,')
+    if ',' not in token:
+        # Chỉ có dấu chấm: nhiều dấu, hoặc đúng 3 chữ số phía sau là phân cách hàng nghìn
+        if token.count('.') > 1 or token[-4:-3] == '.':
+            return float(token.replace('.', ''))
+        return float(token)
+    if '.' not in token:
+        if token.count(',') > 1 or (token[-4:-3] == ',' and not decimal_comma):
+            return float(token.replace(',', ''))
+        return float(token.replace(',', '.'))
+    # Có cả hai dấu: dấu xuất hiện sau cùng là dấu thập phân
+    if token.rfind('.') > token.rfind(','):
+        return float(token.replace(',', ''))
+    return float(token.replace('.', '').replace(',', '.'))
+
+def _parse_price_unit(tail):
+    # Trả về ("," là dấu thập phân, hệ số nhân ra VNĐ/lượng, có áp dụng PRICE_THOUSANDS_FLOOR)
+    normalized = unicodedata.normalize('NFC', tail).lower()
+    scale_x, scale, multiplier_word, currency, weight = _PRICE_UNIT_RE.match(normalized).groups()
+    multiplier = _PRICE_MULTIPLIERS[multiplier_word] if multiplier_word else 1
+    scale = scale_x or scale
+    apply_floor = False
+    if scale:
+        multiplier *= _parse_price_number(scale, False)
+    elif not multiplier_word:
+        if currency:
+            apply_floor = True
+        else:
+            multiplier = _PRICE_DEFAULT_MULTIPLIER
+    if weight:
+        multiplier *= _PRICE_WEIGHTS[weight]
+    unit = (multiplier >= 1000000, multiplier, apply_floor)
+
+    if len(_price_units) >= _PRICE_UNIT_CACHE_SIZE:
+        _price_units.clear()
+    _price_units[tail] = unit
+    return unit
+
+def normalize_price(text):
     if not text:
         return None
-    m = re.search(r'[\d\.]+', text)
-    if not m:
-        return None
-    s = m.group(0).replace('.', '')   # "133.100" -> "133100"
+    # Dạng niêm yết của trang nguồn "133.100"/"133,100": chỉ có chữ số ASCII và một loại dấu phân cách hàng nghìn.
+    # isdigit() đúng cả với chữ số Unicode ("²") nên phải kiểm tra isascii() trước
+    sep = text[-4:-3]
+    if sep == '.' or sep == ',':
+        digits = text.replace(sep, '')
+        if digits.isascii() and digits.isdigit():
+            value = float(digits) * _PRICE_DEFAULT_MULTIPLIER
+            return value if math.isfinite(value) else None
+    elif text.isascii() and text.isdigit():
+        value = float(text) * _PRICE_DEFAULT_MULTIPLIER
+        return value if math.isfinite(value) else None
+    # Đường nhanh: chuỗi bắt đầu bằng số thì tách phần số/đơn vị bằng lstrip, không cần regex.
+    # Phần đơn vị rỗng cũng đi qua bảng _price_units như mọi đơn vị khác
+    tail = text.lstrip(_PRICE_NUMBER_CHARS)
+    if len(tail) == len(text):
+        m = _PRICE_NUMBER_RE.search(text)
+        if m is None:
+            return None
+        token = m.group()
+        tail = text[m.end():]
+    else:
+        token = text[:len(text) - len(tail)]
+
     try:
-        return float(s) * 1000
-    except:
+        decimal_comma, multiplier, apply_floor = _price_units.get(tail) or _parse_price_unit(tail)
+        if token.isdigit():
+            value = float(token)
+        else:
+            # Dạng phổ biến nhất "133.100"/"133,100": một loại dấu, nhóm cuối 3 chữ số là phân cách hàng nghìn
+            sep = token[-4:-3]
+            if sep == '.' and ',' not in token:
+                value = float(token.replace('.', ''))
+            elif sep == ',' and not decimal_comma and '.' not in token:
+                value = float(token.replace(',', ''))
+            else:
+                value = _parse_price_number(token, decimal_comma)
+    except ValueError:
+        return None
+    value *= multiplier
+    if apply_floor and value < PRICE_THOUSANDS_FLOOR:
+        value *= 1000
+    # Số quá dài (hơn 308 chữ số) hoặc hệ số quá lớn cho inf/nan, không phải giá hợp lệ
+    return value if math.isfinite(value) else None
+
+def parse_price_from_text(text):
+    if not text:
         return None
+    return normalize_price(text)
 
 def crawl_btmc(debug=False):
-    url = "https://giavang.org/trong-nuoc/bao-tin-minh-chau/"
+    url = BTMC_URL
     headers = {
         "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/117.0 Safari/537.36")
     }
 
-    sess = make_session()
-    resp = sess.get(url, headers=headers, timeout=15)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+    with span("fetch"):
+        sess = make_session()
+        resp = sess.get(url, headers=headers, timeout=15)
+        resp.raise_for_status()
+    with span("parse"):
+        return parse_btmc_html(resp.text)
+
+def parse_btmc_html(html):
+    soup = BeautifulSoup(html, "html.parser")
 
     results = []
 
@@ -138,20 +538,175 @@ def crawl_btmc(debug=False):
                         sell_price = parsed_price
 
             if buy_price is not None or sell_price is not None:
-                now = datetime.now()
-                formatted_time = now.strftime("%d/%m/%Y %H:%M:%S")
-                record = {
-                    "dealer": "BTMC",
-                    "type": gold_type,
-                    "time": formatted_time,
-                    "timestamp": now.timestamp(),
-                    "Mua vào": buy_price,
-                    "Bán ra": sell_price
-                }
+                record = GoldRecord("BTMC", gold_type, time.time(), buy_price, sell_price)
                 results.append(record)
 
     return results
 
+# Backend lưu trong bộ nhớ của process, giới hạn số khóa theo kiểu LRU
+class MemoryCacheBackend:
+    def __init__(self, max_entries=32):
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, expires_at):
+        with self.lock:
+            self.entries[key] = {"value": value, "expires_at": expires_at}
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+# Backend lưu ra file JSON để nhiều process (worker gunicorn, scheduler) dùng chung một kết quả
+class FileCacheBackend:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        return self._read().get(key)
+
+    def set(self, key, value, expires_at):
+        with self.lock:
+            entries = self._read()
+            entries[key] = {"value": value, "expires_at": expires_at}
+            # Ghi ra file tạm rồi đổi tên để process khác không đọc phải file ghi dở
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, default=record_to_json)
+            os.replace(tmp_path, self.path)
+
+# Backend dùng client tương thích Redis (có get/set với tham số ex), không import redis trực tiếp
+class RedisCacheBackend:
+    def __init__(self, client, prefix="crawl:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def set(self, key, value, expires_at):
+        ttl = max(1, int(expires_at - time.time()))
+        payload = json.dumps({"value": value, "expires_at": expires_at}, ensure_ascii=False, default=record_to_json)
+        self.client.set(self.prefix + key, payload, ex=ttl)
+
+# Bộ nhớ đệm kết quả cào có TTL; các request đồng thời cùng khóa chỉ chờ một lần cào duy nhất
+class CrawlCache:
+    def __init__(self, backend, ttl=CRAWL_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0, "writeErrors": 0}
+
+    def _get_fresh(self, key):
+        entry = self.backend.get(key)
+        if entry is not None and entry["expires_at"] > time.time():
+            return entry
+        return None
+
+    def set(self, key, value):
+        self.backend.set(key, value, time.time() + self.ttl)
+
+    def peek(self, key):
+        # Giá trị mới nhất kể cả khi đã quá TTL, không bao giờ tự cào; dùng ở chế độ farm nơi worker cập nhật cache
+        entry = self.backend.get(key)
+        return entry["value"] if entry is not None else None
+
+    def get_or_fetch(self, key, fetch_function):
+        entry = self._get_fresh(key)
+        if entry is not None:
+            with self.lock:
+                self.stats["hits"] += 1
+            return entry["value"]
+
+        with self.lock:
+            flight = self.inflight.get(key)
+            if flight is not None:
+                self.stats["coalesced"] += 1
+                is_leader = False
+            else:
+                # Kiểm tra lại vì một lần cào khác có thể vừa hoàn tất
+                entry = self._get_fresh(key)
+                if entry is not None:
+                    self.stats["hits"] += 1
+                    return entry["value"]
+                flight = {"event": threading.Event(), "value": None, "error": None}
+                self.inflight[key] = flight
+                self.stats["misses"] += 1
+                is_leader = True
+
+        if not is_leader:
+            flight["event"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["value"]
+
+        try:
+            try:
+                value = fetch_function()
+            except Exception as e:
+                flight["error"] = e
+                with self.lock:
+                    self.stats["errors"] += 1
+                raise
+            flight["value"] = value
+            try:
+                self.set(key, value)
+            except Exception as e:
+                # Cào đã thành công, lỗi ghi cache (Redis/file) không được biến thành lỗi cho người gọi
+                logger.error(f"Không ghi được cache cho khóa {key}: {str(e)}")
+                with self.lock:
+                    self.stats["writeErrors"] += 1
+            return value
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            flight["event"].set()
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["inflight"] = len(self.inflight)
+        stats["ttl"] = self.ttl
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+def make_crawl_cache(backend=CRAWL_CACHE_BACKEND, ttl=CRAWL_CACHE_TTL, mode=CRAWL_MODE):
+    if backend == "memory" and mode == "farm":
+        raise ValueError("CRAWL_MODE=farm cần CRAWL_CACHE_BACKEND dùng chung giữa các process (file hoặc redis)")
+    if backend == "memory":
+        return CrawlCache(MemoryCacheBackend(), ttl)
+    if backend == "file":
+        return CrawlCache(FileCacheBackend(CRAWL_CACHE_FILE), ttl)
+    if backend == "redis":
+        # Thư viện redis là phụ thuộc tuỳ chọn, chỉ cần khi chọn backend này
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CRAWL_CACHE_BACKEND=redis cần cài thư viện redis (pip install redis)")
+        return CrawlCache(RedisCacheBackend(redis.Redis.from_url(CRAWL_CACHE_REDIS_URL)), ttl)
+    raise ValueError(f"CRAWL_CACHE_BACKEND không hợp lệ: {backend!r}, chỉ hỗ trợ {', '.join(CRAWL_CACHE_BACKENDS)}")
+
+crawl_cache = make_crawl_cache()
+
 def load_history():
     if not os.path.exists(HISTORY_FILE):
         return []
@@ -161,22 +716,27 @@ def load_history():
         except Exception:
             history = []
     cutoff = datetime.now() - timedelta(days=HISTORY_DAYS)
-    filtered = [item for item in history if item.get("timestamp", 0) >= cutoff.timestamp()]
+    filtered = [GoldRecord.from_dict(item) for item in history if item.get("timestamp", 0) >= cutoff.timestamp()]
     return filtered
 
 def save_history(history):
     with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+        json.dump([item.to_dict() for item in history], f, ensure_ascii=False, indent=2)
 
 def update_history(new_data):
+    old_signature = _history_signature()
     history = load_history()
-    for item in new_data:
-        similar = [h for h in history if h["type"] == item["type"]]
-        if not similar or abs(item["timestamp"] - similar[-1]["timestamp"]) > 60:
+    appended = []
+    for item in map(as_record, new_data):
+        similar = [h for h in history if h.type == item.type]
+        if not similar or abs(item.timestamp - similar[-1].timestamp) > 60:
             history.append(item)
+            appended.append(item)
     cutoff = datetime.now() - timedelta(days=HISTORY_DAYS)
-    history = [item for item in history if item.get("timestamp", 0) >= cutoff.timestamp()]
+    history = [item for item in history if item.timestamp >= cutoff.timestamp()]
     save_history(history)
+    rolling_stats.on_history_updated(history, appended, old_signature)
+    series_cache.on_history_updated(history)
     return history
 
 def get_price_trend(current, history, key):
@@ -197,6 +757,580 @@ def get_price_trend(current, history, key):
     else:
         return {"symbol": "▬", "percent": 0}
 
+def lttb_downsample(points, threshold):
+    # Giảm số điểm bằng thuật toán Largest-Triangle-Three-Buckets, giữ được hình dạng đường giá
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Điểm trung bình của bucket kế tiếp
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = avg_y = 0.0
+        for j in range(avg_start, avg_end):
+            avg_x += points[j][0]
+            avg_y += points[j][1]
+        count = avg_end - avg_start
+        avg_x /= count
+        avg_y /= count
+
+        # Chọn điểm tạo tam giác có diện tích lớn nhất trong bucket hiện tại
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        ax, ay = points[a]
+        max_area = -1
+        next_a = range_start
+        for j in range(range_start, range_end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > max_area:
+                max_area = area
+                next_a = j
+        sampled.append(points[next_a])
+        a = next_a
+
+    sampled.append(points[-1])
+    return sampled
+
+def build_price_series(history, gold_type, start, end, max_points):
+    # max_points = None: trả về toàn bộ điểm, chưa giảm
+    series = {}
+    for name in PRICE_KEYS:
+        points = [(item.timestamp, getattr(item, name)) for item in history
+                  if item.type == gold_type and getattr(item, name) is not None
+                  and start <= item.timestamp <= end]
+        points.sort()
+        series[name] = points if max_points is None else lttb_downsample(points, max_points)
+    return series
+
+def _history_signature():
+    try:
+        st = os.stat(HISTORY_FILE)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def pick_point_budget(max_points):
+    # Làm tròn xuống mức số điểm cố định gần nhất để mọi client dùng chung kết quả đã tính sẵn
+    budgets = [b for b in SERIES_POINT_BUDGETS if b <= max_points]
+    return budgets[-1] if budgets else SERIES_POINT_BUDGETS[0]
+
+# Chuỗi giá đã giảm điểm được tính sẵn cho mỗi (loại vàng, khoảng thời gian có tên, mức số điểm).
+# Tính lại khi lịch sử thay đổi hoặc sau SERIES_REFRESH_SECONDS để khoảng "24h" luôn trượt theo thời gian
+class SeriesCache:
+    def __init__(self, ranges=SERIES_RANGES, budgets=SERIES_POINT_BUDGETS):
+        self.ranges = ranges
+        self.budgets = budgets
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.signature = None
+        self.built_at = 0
+
+    def _rebuild(self, history):
+        now = time.time()
+        entries = {}
+        for gold_type in {item.type for item in history}:
+            for range_name, seconds in self.ranges.items():
+                start = now - seconds
+                full = build_price_series(history, gold_type, start, now, None)
+                for budget in self.budgets:
+                    entries[(gold_type, range_name, budget)] = {
+                        "from": start,
+                        "to": now,
+                        "buy": lttb_downsample(full["buy"], budget),
+                        "sell": lttb_downsample(full["sell"], budget)
+                    }
+        self.entries = entries
+        self.built_at = now
+
+    def on_history_updated(self, history):
+        with self.lock:
+            self._rebuild(history)
+            self.signature = _history_signature()
+
+    def get(self, gold_type, range_name, budget):
+        signature = _history_signature()
+        with self.lock:
+            if self.signature is None or self.signature != signature \
+                    or time.time() - self.built_at > SERIES_REFRESH_SECONDS:
+                self._rebuild(load_history())
+                self.signature = signature
+            return self.entries.get((gold_type, range_name, budget))
+
+series_cache = SeriesCache()
+
+# Thống kê trên cửa sổ thời gian trượt: deque đơn điệu cho cao/thấp, tổng dồn cho trung bình/phương sai.
+# Mỗi điểm được thêm và loại bỏ đúng một lần nên chi phí khấu hao là O(1)
+class RollingWindow:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.points = deque()
+        self.max_deque = deque()
+        self.min_deque = deque()
+        self.next_index = 0
+        self._reset_sums()
+
+    def _reset_sums(self):
+        # Cộng dồn độ lệch so với giá trị gốc để tránh mất chính xác khi bình phương giá cỡ 1e8
+        self.origin = None
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def add(self, timestamp, value):
+        if self.origin is None:
+            self.origin = value
+        index = self.next_index
+        self.next_index += 1
+        shifted = value - self.origin
+        self.points.append((index, timestamp, value, shifted))
+        self.total += shifted
+        self.total_sq += shifted * shifted
+
+        while self.max_deque and self.max_deque[-1][1] <= value:
+            self.max_deque.pop()
+        self.max_deque.append((index, value))
+        while self.min_deque and self.min_deque[-1][1] >= value:
+            self.min_deque.pop()
+        self.min_deque.append((index, value))
+        self.expire(timestamp)
+
+    def expire(self, now):
+        cutoff = now - self.seconds
+        while self.points and self.points[0][1] < cutoff:
+            index, _, _, shifted = self.points.popleft()
+            self.total -= shifted
+            self.total_sq -= shifted * shifted
+            if self.max_deque[0][0] == index:
+                self.max_deque.popleft()
+            if self.min_deque[0][0] == index:
+                self.min_deque.popleft()
+        if not self.points:
+            self._reset_sums()
+
+    def snapshot(self):
+        count = len(self.points)
+        if count == 0:
+            return None
+        mean_shift = self.total / count
+        variance = max(self.total_sq / count - mean_shift * mean_shift, 0.0)
+        average = self.origin + mean_shift
+        stdev = variance ** 0.5
+        return {
+            "count": count,
+            "high": self.max_deque[0][1],
+            "low": self.min_deque[0][1],
+            "average": round(average, 2),
+            "stdev": round(stdev, 2),
+            "volatility": round(stdev / average * 100, 3) if average else 0
+        }
+
+# Thống kê trượt theo loại vàng và giá mua/bán, cập nhật dần mỗi khi update_history thêm bản ghi
+class RollingStats:
+    def __init__(self, windows=STATS_WINDOWS):
+        self.windows = windows
+        self.lock = threading.Lock()
+        self.series = {}
+        self.last_timestamp = {}
+        self.signature = None
+
+    def _add(self, record):
+        # Deque đơn điệu yêu cầu thời gian tăng dần, bỏ qua bản ghi đến muộn
+        if record.timestamp < self.last_timestamp.get(record.type, 0):
+            return
+        self.last_timestamp[record.type] = record.timestamp
+        for field in PRICE_KEYS:
+            value = getattr(record, field)
+            if value is None:
+                continue
+            for name, seconds in self.windows.items():
+                key = (record.type, field, name)
+                if key not in self.series:
+                    self.series[key] = RollingWindow(seconds)
+                self.series[key].add(record.timestamp, value)
+
+    def _rebuild(self, history):
+        self.series = {}
+        self.last_timestamp = {}
+        for record in sorted(history, key=lambda r: r.timestamp):
+            self._add(record)
+
+    def on_history_updated(self, history, appended, old_signature):
+        with self.lock:
+            if self.signature is not None and self.signature == old_signature:
+                for record in appended:
+                    self._add(record)
+            else:
+                # Chưa khởi tạo hoặc file đã bị process khác ghi: dựng lại từ lịch sử
+                self._rebuild(history)
+            self.signature = _history_signature()
+
+    def get(self):
+        signature = _history_signature()
+        with self.lock:
+            if self.signature is None or self.signature != signature:
+                self._rebuild(load_history())
+                self.signature = signature
+            now = time.time()
+            result = {}
+            for (gold_type, field, name), window in self.series.items():
+                window.expire(now)
+                result.setdefault(gold_type, {}).setdefault(field, {})[name] = window.snapshot()
+            return result
+
+rolling_stats = RollingStats()
+
+def _price_delta(new, old):
+    if new is None or old is None:
+        return None
+    return new - old
+
+def diff_snapshots(previous, current):
+    # So sánh hai lần cào theo (đại lý, loại vàng): new / changed / unchanged / removed
+    previous_index = {(r.dealer, r.type): r for r in map(as_record, previous)}
+    changes = []
+    summary = {"new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+    for record in map(as_record, current):
+        old = previous_index.pop((record.dealer, record.type), None)
+        change = {"dealer": record.dealer, "type": record.type, "buy": record.buy, "sell": record.sell,
+                  "buyDelta": None, "sellDelta": None}
+        if old is None:
+            change["status"] = "new"
+        else:
+            change["buyDelta"] = _price_delta(record.buy, old.buy)
+            change["sellDelta"] = _price_delta(record.sell, old.sell)
+            same = record.buy == old.buy and record.sell == old.sell
+            change["status"] = "unchanged" if same else "changed"
+        summary[change["status"]] += 1
+        changes.append(change)
+    for old in previous_index.values():
+        changes.append({"dealer": old.dealer, "type": old.type, "buy": None, "sell": None,
+                        "buyDelta": None, "sellDelta": None, "status": "removed"})
+        summary["removed"] += 1
+    return {"changes": changes, "summary": summary}
+
+# Nhật ký sự kiện chỉ ghi thêm; người dùng đọc tiếp từ một số thứ tự thay vì tải lại toàn bộ dữ liệu
+class EventLog:
+    def __init__(self, path=EVENT_LOG_FILE, max_memory=EVENT_LOG_MEMORY, index_stride=EVENT_INDEX_STRIDE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.events = deque(maxlen=max_memory)
+        self.index_stride = index_stride
+        # Chỉ mục thưa (seq, vị trí byte của dòng) và sự kiện mới nhất của từng nguồn, dựng lại khi đọc file
+        self.index_seqs = []
+        self.index_offsets = []
+        self.latest_by_source = {}
+        self.last_seq = 0
+        self.offset = 0
+        with self.lock:
+            self._sync()
+
+    def _remember(self, event, line_offset):
+        self.events.append(event)
+        self.last_seq = max(self.last_seq, event["seq"])
+        if "source" in event:
+            self.latest_by_source[event["source"]] = event
+        if not self.index_seqs or event["seq"] >= self.index_seqs[-1] + self.index_stride:
+            self.index_seqs.append(event["seq"])
+            self.index_offsets.append(line_offset)
+
+    def _sync(self):
+        # Đọc các dòng mới do process khác (worker farm) ghi thêm kể từ lần đọc trước
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size == self.offset:
+            return
+        if size < self.offset:
+            # File bị cắt ngắn/xoay vòng: đọc lại từ đầu, last_seq giữ nguyên để số thứ tự không lùi
+            self.events.clear()
+            self.index_seqs.clear()
+            self.index_offsets.clear()
+            self.latest_by_source.clear()
+            self.offset = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.seek(self.offset)
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                line_offset = self.offset
+                self.offset += len(line.encode("utf-8"))
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                self._remember(event, line_offset)
+
+    def append(self, payload):
+        with self.lock:
+            self._sync()
+            event = {"seq": self.last_seq + 1, "timestamp": time.time()}
+            event.update(payload)
+            line = json.dumps(event, ensure_ascii=False) + "\n"
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            line_offset = self.offset
+            self.offset += len(line.encode("utf-8"))
+            self._remember(event, line_offset)
+            return event
+
+    def read_since(self, seq, limit=EVENT_PAGE_SIZE):
+        with self.lock:
+            self._sync()
+            if not self.events or self.events[0]["seq"] <= seq + 1:
+                return [e for e in self.events if e["seq"] > seq][:limit]
+            # Số thứ tự cũ hơn phần giữ trong bộ nhớ: nhảy tới mốc chỉ mục gần nhất trước seq rồi đọc tiếp,
+            # nên mỗi lần chỉ đọc tối đa index_stride + limit dòng thay vì cả file
+            i = bisect.bisect_right(self.index_seqs, seq + 1) - 1
+            start = self.index_offsets[i] if i >= 0 else 0
+            end = self.offset
+        result = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.seek(start)
+            position = start
+            for line in f:
+                position += len(line.encode("utf-8"))
+                if position > end:
+                    break
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event["seq"] > seq:
+                    result.append(event)
+                    if len(result) >= limit:
+                        break
+        return result
+
+    def last_snapshot(self, source):
+        with self.lock:
+            self._sync()
+            event = self.latest_by_source.get(source)
+        if event is None:
+            return []
+        return [GoldRecord(c["dealer"], c["type"], event["timestamp"], c["buy"], c["sell"])
+                for c in event["changes"] if c["status"] != "removed"]
+
+event_log = EventLog()
+
+def record_snapshot(source, data, log=None):
+    log = log or event_log
+    diff = diff_snapshots(log.last_snapshot(source), data)
+    return log.append({"source": source, "changes": diff["changes"], "summary": diff["summary"]})
+
+# Danh sách nguồn cào, mỗi nguồn (đại lý/tỉnh) là một shard trong chế độ farm
+DEALER_SOURCES = {
+    "BTMC": crawl_btmc,
+}
+
+# Bảng job dùng chung giữa các worker, lưu trong file SQLite
+class CrawlJobStore:
+    def __init__(self, path=FARM_DB_FILE, lease_seconds=FARM_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        with self.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS crawl_jobs (
+                    shard TEXT PRIMARY KEY,
+                    due_at REAL,
+                    lease_owner TEXT,
+                    lease_expires REAL NOT NULL DEFAULT 0,
+                    last_run REAL NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    runs INTEGER NOT NULL DEFAULT 0
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS farm_leader (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    owner TEXT NOT NULL,
+                    expires REAL NOT NULL
+                )""")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE giữ khóa ghi nên cũng dùng làm mutex giữa các process
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            # BEGIN IMMEDIATE có thể thất bại ("database is locked"), khi đó không có gì để rollback
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def try_acquire_leadership(self, owner, now):
+        with self.transaction() as conn:
+            row = conn.execute("SELECT owner, expires FROM farm_leader WHERE id = 1").fetchone()
+            if row is not None and row[0] != owner and row[1] >= now:
+                return False
+            conn.execute("INSERT OR REPLACE INTO farm_leader (id, owner, expires) VALUES (1, ?, ?)",
+                         (owner, now + self.lease_seconds))
+            return True
+
+    def schedule_jobs(self, shards, interval, now):
+        with self.transaction() as conn:
+            for shard in shards:
+                conn.execute("INSERT OR IGNORE INTO crawl_jobs (shard, due_at) VALUES (?, ?)", (shard, now))
+                conn.execute("UPDATE crawl_jobs SET due_at = ? WHERE shard = ? AND due_at IS NULL AND last_run + ? <= ?",
+                             (now, shard, interval, now))
+
+    def lease_job(self, owner, now):
+        # Lấy một shard đến hạn chưa có ai giữ, hoặc lease của worker cũ đã hết hạn
+        with self.transaction() as conn:
+            row = conn.execute("""
+                SELECT shard FROM crawl_jobs
+                WHERE due_at IS NOT NULL AND due_at <= ? AND (lease_owner IS NULL OR lease_expires < ?)
+                ORDER BY due_at LIMIT 1""", (now, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE crawl_jobs SET lease_owner = ?, lease_expires = ? WHERE shard = ?",
+                         (owner, now + self.lease_seconds, row[0]))
+            return row[0]
+
+    def heartbeat(self, shard, owner, now):
+        with self.transaction() as conn:
+            cursor = conn.execute("UPDATE crawl_jobs SET lease_expires = ? WHERE shard = ? AND lease_owner = ?",
+                                  (now + self.lease_seconds, shard, owner))
+            return cursor.rowcount == 1
+
+    def holds_lease(self, conn, shard, owner, now):
+        # Gọi trong transaction(): khóa ghi đang giữ nên không worker nào nhận lại lease giữa lúc kiểm tra và ghi
+        row = conn.execute("SELECT 1 FROM crawl_jobs WHERE shard = ? AND lease_owner = ? AND lease_expires >= ?",
+                           (shard, owner, now)).fetchone()
+        return row is not None
+
+    def complete_job(self, shard, owner, now, error=None, retry_seconds=FARM_RETRY_SECONDS, conn=None):
+        # Thành công thì chờ leader lên lịch lại, lỗi thì thử lại sau retry_seconds.
+        # Truyền conn để hoàn tất job trong cùng transaction với việc ghi dữ liệu
+        if conn is None:
+            with self.transaction() as conn:
+                return self.complete_job(shard, owner, now, error, retry_seconds, conn)
+        due_at = None if error is None else now + retry_seconds
+        conn.execute("""
+            UPDATE crawl_jobs
+            SET lease_owner = NULL, lease_expires = 0, due_at = ?, last_run = ?, last_error = ?, runs = runs + 1
+            WHERE shard = ? AND lease_owner = ?""", (due_at, now, error, shard, owner))
+
+    def get_status(self):
+        conn = self._connect()
+        try:
+            leader = conn.execute("SELECT owner, expires FROM farm_leader WHERE id = 1").fetchone()
+            jobs = conn.execute("""
+                SELECT shard, due_at, lease_owner, lease_expires, last_run, last_error, runs
+                FROM crawl_jobs ORDER BY shard""").fetchall()
+        finally:
+            conn.close()
+        return {
+            "leader": {"owner": leader[0], "expires": leader[1]} if leader else None,
+            "jobs": [{"shard": j[0], "dueAt": j[1], "leaseOwner": j[2], "leaseExpires": j[3],
+                      "lastRun": j[4], "lastError": j[5], "runs": j[6]} for j in jobs]
+        }
+
+# Worker cào dữ liệu: giữ lease theo shard, gửi heartbeat khi đang cào và kiêm leader để lên lịch job
+class CrawlWorker:
+    def __init__(self, store, sources=None, update_function=None, worker_id=None,
+                 interval=FARM_CRAWL_INTERVAL, poll_seconds=FARM_POLL_SECONDS):
+        self.store = store
+        self.sources = sources if sources is not None else DEALER_SOURCES
+        self.update_function = update_function or update_history
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.interval = interval
+        self.poll_seconds = poll_seconds
+        self.stop_event = threading.Event()
+
+    def run_once(self):
+        now = time.time()
+        if self.store.try_acquire_leadership(self.worker_id, now):
+            self.store.schedule_jobs(list(self.sources), self.interval, now)
+        shard = self.store.lease_job(self.worker_id, now)
+        if shard is None:
+            return False
+        self._run_job(shard)
+        return True
+
+    def _run_job(self, shard):
+        done = threading.Event()
+
+        def beat():
+            while not done.wait(FARM_HEARTBEAT_SECONDS):
+                try:
+                    if not self.store.heartbeat(shard, self.worker_id, time.time()):
+                        logger.warning(f"Worker {self.worker_id} đã mất lease của shard {shard}")
+                        return
+                except Exception as e:
+                    # Lỗi tạm thời (database is locked) không được dừng heartbeat, nếu không lease sẽ hết hạn giữa chừng
+                    logger.error(f"Worker {self.worker_id} gửi heartbeat shard {shard} thất bại: {str(e)}")
+
+        heartbeat_thread = threading.Thread(target=beat, daemon=True)
+        heartbeat_thread.start()
+        try:
+            try:
+                logger.info(f"Worker {self.worker_id} bắt đầu cào shard {shard}")
+                with traced("job", f"farm:{shard}"):
+                    with span("crawl"):
+                        data = self.sources[shard]()
+                    # Ghi lịch sử và hoàn tất job trong cùng transaction của bảng job: các process không ghi đè
+                    # file của nhau, và worker đã mất lease (bị treo rồi bị worker khác nhận lại) không ghi trùng
+                    with span("persist"), self.store.transaction() as conn:
+                        persisted = self.store.holds_lease(conn, shard, self.worker_id, time.time())
+                        if persisted:
+                            self.update_function(data)
+                            record_snapshot(shard, data)
+                            self.store.complete_job(shard, self.worker_id, time.time(), conn=conn)
+                if not persisted:
+                    logger.warning(f"Worker {self.worker_id} đã mất lease của shard {shard}, bỏ qua kết quả cào")
+                    return
+                logger.info(f"Worker {self.worker_id} đã cào xong shard {shard}. Số bản ghi: {len(data)}")
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id} lỗi khi cào shard {shard}: {str(e)}")
+                try:
+                    self.store.complete_job(shard, self.worker_id, time.time(), error=str(e))
+                except Exception as e:
+                    # Lease vẫn còn trong bảng job và sẽ hết hạn, khi đó worker khác nhận lại shard
+                    logger.error(f"Worker {self.worker_id} không cập nhật được trạng thái shard {shard}: {str(e)}")
+                return
+
+            try:
+                crawl_cache.set(shard, data)
+            except Exception as e:
+                logger.error(f"Worker {self.worker_id} không ghi được cache shard {shard}: {str(e)}")
+        finally:
+            done.set()
+            heartbeat_thread.join()
+
+    def run(self):
+        logger.info(f"Worker {self.worker_id} đã khởi động")
+        failures = 0
+        while not self.stop_event.is_set():
+            try:
+                busy = self.run_once()
+                failures = 0
+            except Exception as e:
+                # Lỗi tạm thời của SQLite (database is locked, I/O) không được làm chết worker: chờ lùi dần rồi thử lại
+                failures += 1
+                delay = min(self.poll_seconds * 2 ** failures, FARM_RETRY_SECONDS)
+                logger.error(f"Worker {self.worker_id} gặp lỗi, thử lại sau {delay:.1f}s: {str(e)}")
+                self.stop_event.wait(delay)
+                continue
+            if not busy:
+                self.stop_event.wait(self.poll_seconds)
+        logger.info(f"Worker {self.worker_id} đã dừng")
+
+    def stop(self):
+        self.stop_event.set()
+
 app = Flask(__name__, static_url_path='/static')
 
 HTML_TEMPLATE = """
@@ -331,6 +1465,41 @@ HTML_TEMPLATE = """
         .apply-btn:hover, .clear-btn:hover {
             background-color: var(--light-primary);
         }
+
+        .chart-toolbar {
+            display: flex;
+            flex-wrap: wrap;
+            gap: 8px;
+            padding: 15px 15px 0 15px;
+        }
+
+        .chart-wrapper {
+            position: relative;
+            padding: 15px;
+        }
+
+        #price-chart {
+            width: 100%;
+            height: 320px;
+            display: block;
+        }
+
+        .chart-legend {
+            display: flex;
+            gap: 15px;
+            padding: 0 15px 15px 15px;
+            font-size: 0.9rem;
+        }
+
+        .legend-buy { color: var(--increase-color); }
+        .legend-sell { color: var(--decrease-color); }
+
+        .price-stats {
+            font-size: 0.8rem;
+            color: var(--neutral-color);
+            margin-top: 4px;
+            white-space: nowrap;
+        }
     </style>
 </head>
 <body>
@@ -393,6 +1562,11 @@ HTML_TEMPLATE = """
                                         {% endif %}
                                     </span>
                                 </div>
+                                {% for window, st in stats.get(item['type'], {}).get('buy', {}).items() if st %}
+                                <div class="price-stats" title="{{ st['count'] }} lần cập nhật">
+                                    {{ window }}: cao {{ "{:,.0f}".format(st['high']) }} · thấp {{ "{:,.0f}".format(st['low']) }} · TB {{ "{:,.0f}".format(st['average']) }} · biến động {{ st['volatility'] }}%
+                                </div>
+                                {% endfor %}
                             </td>
                             <td class="price" style="text-align: right;">
                                 <div class="price-cell">
@@ -404,6 +1578,11 @@ HTML_TEMPLATE = """
                                         {% endif %}
                                     </span>
                                 </div>
+                                {% for window, st in stats.get(item['type'], {}).get('sell', {}).items() if st %}
+                                <div class="price-stats" title="{{ st['count'] }} lần cập nhật">
+                                    {{ window }}: cao {{ "{:,.0f}".format(st['high']) }} · thấp {{ "{:,.0f}".format(st['low']) }} · TB {{ "{:,.0f}".format(st['average']) }} · biến động {{ st['volatility'] }}%
+                                </div>
+                                {% endfor %}
                             </td>
                             <td style="text-align: center;">{{ item['time'].split(' ')[1] }}</td>
                         </tr>
@@ -413,6 +1592,31 @@ HTML_TEMPLATE = """
             </div>
         </div>
 
+        <div class="card">
+            <div class="card-header">
+                <h2>Biểu đồ giá vàng</h2>
+            </div>
+            <div class="card-body">
+                <div class="chart-toolbar">
+                    <button class="filter-btn chart-type active" data-value="Giá vàng Miếng" onclick="selectChart(this, 'type')">
+                        <span class="filter-icon">🪙</span> Vàng miếng
+                    </button>
+                    <button class="filter-btn chart-type" data-value="Giá vàng Nhẫn" onclick="selectChart(this, 'type')">
+                        <span class="filter-icon">💍</span> Vàng nhẫn
+                    </button>
+                    <button class="filter-btn chart-range" data-value="24h" onclick="selectChart(this, 'range')">24 giờ</button>
+                    <button class="filter-btn chart-range active" data-value="7d" onclick="selectChart(this, 'range')">7 ngày</button>
+                </div>
+                <div class="chart-wrapper">
+                    <canvas id="price-chart"></canvas>
+                </div>
+                <div class="chart-legend">
+                    <span class="legend-buy">━ Mua vào</span>
+                    <span class="legend-sell">━ Bán ra</span>
+                </div>
+            </div>
+        </div>
+
         <div class="card">
             <div class="card-header">
                 <h2>Lịch sử giá vàng 7 ngày gần nhất</h2>
@@ -740,6 +1944,112 @@ HTML_TEMPLATE = """
             });
         }
 
+        // Trạng thái biểu đồ: loại vàng và khoảng thời gian có tên (tính sẵn ở server)
+        const chartState = {
+            type: 'Giá vàng Miếng',
+            range: '7d'
+        };
+
+        // Hàm chọn loại vàng hoặc khoảng thời gian cho biểu đồ
+        function selectChart(button, key) {
+            document.querySelectorAll(`.chart-${key}`).forEach(btn => btn.classList.remove('active'));
+            button.classList.add('active');
+            chartState[key] = button.getAttribute('data-value');
+            loadChart();
+        }
+
+        // Hàm tải dữ liệu đã giảm điểm từ server, số điểm tối đa bằng số pixel chiều ngang
+        function loadChart() {
+            const canvas = document.getElementById('price-chart');
+            if (!canvas) {
+                return;
+            }
+            const width = Math.max(canvas.clientWidth, 100);
+            const params = new URLSearchParams({
+                type: chartState.type,
+                range: chartState.range,
+                max_points: width
+            });
+            fetch('/api/series?' + params.toString())
+                .then(response => response.json())
+                .then(result => {
+                    if (result.statusCode === 200) {
+                        drawChart(canvas, result.data);
+                    }
+                })
+                .catch(error => console.error('Error:', error));
+        }
+
+        // Hàm vẽ biểu đồ đường bằng canvas
+        function drawChart(canvas, data) {
+            const ratio = window.devicePixelRatio || 1;
+            const width = canvas.clientWidth;
+            const height = canvas.clientHeight;
+            canvas.width = width * ratio;
+            canvas.height = height * ratio;
+            const ctx = canvas.getContext('2d');
+            ctx.setTransform(ratio, 0, 0, ratio, 0, 0);
+            ctx.clearRect(0, 0, width, height);
+
+            const points = data.buy.concat(data.sell);
+            if (points.length === 0) {
+                ctx.fillStyle = '#666';
+                ctx.textAlign = 'center';
+                ctx.fillText('Chưa có dữ liệu trong khoảng thời gian này', width / 2, height / 2);
+                return;
+            }
+
+            const padLeft = 90, padRight = 10, padTop = 10, padBottom = 25;
+            let minX = data.from, maxX = data.to;
+            let minY = Math.min(...points.map(p => p[1]));
+            let maxY = Math.max(...points.map(p => p[1]));
+            if (minY === maxY) {
+                minY -= 1;
+                maxY += 1;
+            }
+            const scaleX = x => padLeft + (x - minX) / (maxX - minX) * (width - padLeft - padRight);
+            const scaleY = y => height - padBottom - (y - minY) / (maxY - minY) * (height - padTop - padBottom);
+
+            // Trục và nhãn giá
+            ctx.strokeStyle = '#dee2e6';
+            ctx.fillStyle = '#6c757d';
+            ctx.font = '12px Roboto, sans-serif';
+            ctx.textAlign = 'right';
+            for (let i = 0; i <= 4; i++) {
+                const value = minY + (maxY - minY) * i / 4;
+                const y = scaleY(value);
+                ctx.beginPath();
+                ctx.moveTo(padLeft, y);
+                ctx.lineTo(width - padRight, y);
+                ctx.stroke();
+                ctx.fillText(Math.round(value).toLocaleString('vi-VN'), padLeft - 5, y + 4);
+            }
+            ctx.textAlign = 'center';
+            [minX, (minX + maxX) / 2, maxX].forEach(x => {
+                const label = new Date(x * 1000).toLocaleString('vi-VN', {day: '2-digit', month: '2-digit', hour: '2-digit', minute: '2-digit'});
+                ctx.fillText(label, Math.min(Math.max(scaleX(x), padLeft + 40), width - 40), height - 5);
+            });
+
+            // Đường giá mua vào và bán ra
+            [[data.buy, '#198754'], [data.sell, '#dc3545']].forEach(([series, color]) => {
+                if (series.length === 0) {
+                    return;
+                }
+                ctx.strokeStyle = color;
+                ctx.lineWidth = 2;
+                ctx.beginPath();
+                series.forEach((p, i) => {
+                    if (i === 0) {
+                        ctx.moveTo(scaleX(p[0]), scaleY(p[1]));
+                    } else {
+                        ctx.lineTo(scaleX(p[0]), scaleY(p[1]));
+                    }
+                });
+                ctx.stroke();
+            });
+            ctx.lineWidth = 1;
+        }
+
         function refreshData() {
             document.getElementById('status').textContent = 'Đang cập nhật...';
             fetch(window.location.href)
@@ -758,6 +2068,7 @@ HTML_TEMPLATE = """
 
                     // Khởi tạo lại sau khi tải dữ liệu mới
                     initFilters();
+                    loadChart();
                 })
                 .catch(error => {
                     console.error('Error:', error);
@@ -790,6 +2101,14 @@ HTML_TEMPLATE = """
 
         // Sắp xếp mặc định khi tải trang
         window.addEventListener('load', initFilters);
+        window.addEventListener('load', loadChart);
+
+        // Chờ người dùng kéo xong cửa sổ rồi mới tải lại biểu đồ
+        let chartResizeTimer = null;
+        window.addEventListener('resize', () => {
+            clearTimeout(chartResizeTimer);
+            chartResizeTimer = setTimeout(loadChart, 250);
+        });
     </script>
 
     <footer>
@@ -799,6 +2118,20 @@ HTML_TEMPLATE = """
 </html>
 """
 
+@app.before_request
+def start_request_trace():
+    if PROFILE_ENABLED:
+        trace = ProfileTrace("request", f"{request.method} {request.path}")
+        g.profile_trace = trace
+        _current_trace.set(trace)
+
+@app.teardown_request
+def finish_request_trace(exc):
+    trace = g.pop("profile_trace", None)
+    if trace is not None:
+        _current_trace.set(None)
+        trace.finish()
+
 @app.route('/')
 def index():
     try:
@@ -806,34 +2139,147 @@ def index():
         global current_gold_data
         data = current_gold_data
 
-        # Nếu chưa có dữ liệu (lần đầu chạy), thì thực hiện cào dữ liệu
-        if not data:
-            data = crawl_btmc()
+        if CRAWL_MODE == "farm":
+            # Dữ liệu do các worker cào và ghi vào cache dùng chung: đọc lại mỗi request, web không tự cào
+            with span("crawl"):
+                data = [as_record(item) for item in crawl_cache.peek(CRAWL_CACHE_KEY) or []]
+        # Nếu chưa có dữ liệu (lần đầu chạy), lấy qua cache để các request đồng thời chỉ cào một lần
+        elif not data:
+            with span("crawl"):
+                data = [as_record(item) for item in crawl_cache.get_or_fetch(CRAWL_CACHE_KEY, crawl_btmc)]
             current_gold_data = data
 
         # Lấy lịch sử giá vàng
-        history = load_history()
+        with span("load"):
+            history = load_history()
 
         # Tạo từ điển xu hướng giá cho từng loại vàng
-        trends = {}
-        for item in data:
-            if item["type"] not in trends:
-                trends[item["type"]] = {"buy": {"symbol": "▬", "percent": 0}, "sell": {"symbol": "▬", "percent": 0}}
-            trends[item["type"]]["buy"] = get_price_trend(item, history, "Mua vào")
-            trends[item["type"]]["sell"] = get_price_trend(item, history, "Bán ra")
-
-        return render_template_string(HTML_TEMPLATE, data=data, history=history, trends=trends)
+        with span("trend"):
+            trends = {}
+            for item in data:
+                if item["type"] not in trends:
+                    trends[item["type"]] = {"buy": {"symbol": "▬", "percent": 0}, "sell": {"symbol": "▬", "percent": 0}}
+                trends[item["type"]]["buy"] = get_price_trend(item, history, "Mua vào")
+                trends[item["type"]]["sell"] = get_price_trend(item, history, "Bán ra")
+
+        # Thống kê trượt đã được tính sẵn khi cập nhật lịch sử
+        with span("stats"):
+            stats = rolling_stats.get()
+
+        with span("render"):
+            return render_template_string(HTML_TEMPLATE, data=data, history=history, trends=trends, stats=stats)
     except Exception as e:
         logger.error(f"Lỗi khi hiển thị trang: {str(e)}")
         return f"Lỗi: {str(e)}"
 
+@app.route('/api/series')
+def api_series():
+    gold_type = request.args.get('type', '').strip()
+    range_name = request.args.get('range')
+    try:
+        max_points = int(request.args.get('max_points', SERIES_DEFAULT_POINTS))
+        start = float(request.args['from']) if 'from' in request.args else None
+        end = float(request.args['to']) if 'to' in request.args else None
+    except ValueError:
+        return jsonify({"statusCode": 400, "message": "Tham số from/to/max_points không hợp lệ", "data": None}), 400
+
+    if not gold_type:
+        return jsonify({"statusCode": 400, "message": "Thiếu tham số type", "data": None}), 400
+    if any(value is not None and not math.isfinite(value) for value in (start, end)):
+        return jsonify({"statusCode": 400, "message": "Tham số from/to phải là số hữu hạn", "data": None}), 400
+    if range_name is not None and range_name not in SERIES_RANGES:
+        return jsonify({"statusCode": 400, "message": f"Tham số range phải thuộc {list(SERIES_RANGES)}", "data": None}), 400
+
+    # Giới hạn số điểm theo các mức cố định để kích thước response không phụ thuộc vào khoảng thời gian
+    budget = pick_point_budget(max_points)
+
+    try:
+        if start is None and end is None:
+            # Khoảng có tên (mặc định 7 ngày): lấy từ kết quả đã tính sẵn
+            series = series_cache.get(gold_type, range_name or "7d", budget)
+            if series is None:
+                now = time.time()
+                series = {"from": now - SERIES_RANGES[range_name or "7d"], "to": now, "buy": [], "sell": []}
+        else:
+            now = time.time()
+            start = start if start is not None else now - HISTORY_DAYS * 86400
+            end = end if end is not None else now
+            if start > end:
+                return jsonify({"statusCode": 400, "message": "Tham số from phải nhỏ hơn to", "data": None}), 400
+            series = build_price_series(load_history(), gold_type, start, end, budget)
+            series["from"] = start
+            series["to"] = end
+    except Exception as e:
+        logger.error(f"Lỗi khi lấy chuỗi giá vàng: {str(e)}")
+        return jsonify({"statusCode": 500, "message": "Lỗi khi lấy dữ liệu biểu đồ", "data": None}), 500
+
+    return jsonify({
+        "statusCode": 200,
+        "message": "OK",
+        "data": {
+            "type": gold_type,
+            "from": series["from"],
+            "to": series["to"],
+            "maxPoints": budget,
+            "buy": series["buy"],
+            "sell": series["sell"]
+        }
+    })
+
+@app.route('/api/crawl-cache')
+def api_crawl_cache():
+    return jsonify({"statusCode": 200, "message": "OK", "data": crawl_cache.get_stats()})
+
+@app.route('/api/stats')
+def api_stats():
+    return jsonify({"statusCode": 200, "message": "OK", "data": rolling_stats.get()})
+
+@app.route('/api/events')
+def api_events():
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', EVENT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({"statusCode": 400, "message": "Tham số since/limit không hợp lệ", "data": None}), 400
+    limit = max(1, min(limit, EVENT_PAGE_SIZE))
+
+    events = event_log.read_since(since, limit)
+    return jsonify({
+        "statusCode": 200,
+        "message": "OK",
+        "data": {
+            "events": events,
+            "nextSeq": events[-1]["seq"] if events else since,
+            "lastSeq": event_log.last_seq
+        }
+    })
+
+@app.route('/api/crawl-farm')
+def api_crawl_farm():
+    if CRAWL_MODE != "farm":
+        return jsonify({"statusCode": 404, "message": "Chế độ farm chưa được bật", "data": None}), 404
+    return jsonify({"statusCode": 200, "message": "OK", "data": CrawlJobStore().get_status()})
+
 if __name__ == "__main__":
-    # Khởi tạo và bắt đầu scheduler
-    scheduler = GoldPriceScheduler(crawl_btmc, update_history)
-    scheduler.start()
+    # Chạy một worker của farm: python BTMC.py worker
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        worker = CrawlWorker(CrawlJobStore())
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            worker.stop()
+        sys.exit(0)
+
+    # Ở chế độ farm việc cào do các worker đảm nhận, web chỉ đọc dữ liệu
+    scheduler = None
+    if CRAWL_MODE != "farm":
+        # Khởi tạo và bắt đầu scheduler
+        scheduler = GoldPriceScheduler(crawl_btmc, update_history)
+        scheduler.start()
 
     try:
         app.run(debug=True)
     finally:
         # Dừng scheduler khi tắt ứng dụng
-        scheduler.stop()
+        if scheduler is not None:
+            scheduler.stop()
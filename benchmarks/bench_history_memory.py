@@ -0,0 +1,65 @@
+# So sánh bộ nhớ của lịch sử giá: GoldRecord (__slots__, chuỗi intern) với danh sách dict định dạng cũ
+# Chạy: python benchmarks/bench_history_memory.py [số bản ghi]
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from BTMC import GoldRecord  # noqa: E402
+
+GOLD_TYPES = ("Giá vàng Miếng", "Giá vàng Nhẫn")
+START_TIMESTAMP = 1700000000.0
+
+
+def make_rows(count):
+    # Mỗi bản ghi cách nhau 5 phút, giá thay đổi theo chỉ số để không có giá trị dùng chung
+    for i in range(count):
+        yield (GOLD_TYPES[i % 2], START_TIMESTAMP + i * 300, 133100000 + i, 135100000 + i)
+
+
+def build_dicts(count):
+    return [{
+        "dealer": "BTMC",
+        "type": gold_type,
+        "time": datetime.fromtimestamp(timestamp).strftime("%d/%m/%Y %H:%M:%S"),
+        "timestamp": timestamp,
+        "Mua vào": buy,
+        "Bán ra": sell,
+    } for gold_type, timestamp, buy, sell in make_rows(count)]
+
+
+def build_records(count):
+    return [GoldRecord("BTMC", gold_type, timestamp, buy, sell) for gold_type, timestamp, buy, sell in make_rows(count)]
+
+
+def measure(build, count):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    history = build(count)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del history
+    gc.collect()
+    return current, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    results = {}
+    for name, build in (("list[dict]", build_dicts), ("list[GoldRecord]", build_records)):
+        size, elapsed = measure(build, count)
+        results[name] = size
+        print(f"{name:>17}: {size / 2 ** 20:8.1f} MiB, {size / count:6.1f} byte/bản ghi, tạo trong {elapsed:.2f}s")
+    print(f"GoldRecord dùng {results['list[GoldRecord]'] / results['list[dict]']:.0%} bộ nhớ so với dict "
+          f"({count:,} bản ghi)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# Đo tốc độ normalize_price trên các chuỗi không lặp lại (không có cache kết quả nào được dùng)
+# Chạy: python benchmarks/bench_parse_price.py [số chuỗi]
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from BTMC import normalize_price  # noqa: E402
+
+TARGET_PER_SECOND = 1000000
+ROUNDS = 7
+
+
+def make_inputs(count, seed=2025):
+    # Hỗn hợp định dạng: phần lớn là kiểu của trang nguồn, còn lại có đơn vị
+    rng = random.Random(seed)
+    inputs = set()
+    while len(inputs) < count:
+        n = rng.randint(1000, 999999)
+        kind = rng.random()
+        if kind < 0.5:
+            text = f"{n:,}".replace(",", ".")
+        elif kind < 0.7:
+            text = f"{n:,}"
+        elif kind < 0.8:
+            text = f"{n * 1000:,}".replace(",", ".") + " đ/lượng"
+        elif kind < 0.9:
+            text = f"{n:,}".replace(",", ".") + " x1000đ/lượng"
+        else:
+            text = f"{n / 1000:.3f}".replace(".", ",") + " triệu"
+        inputs.add(text)
+    return list(inputs)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    inputs = make_inputs(count)
+    assert len(set(inputs)) == len(inputs)
+
+    best = 0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        for text in inputs:
+            normalize_price(text)
+        best = max(best, len(inputs) / (time.perf_counter() - start))
+
+    print(f"normalize_price: {best:,.0f} chuỗi/giây ({len(inputs):,} chuỗi khác nhau, tốt nhất {ROUNDS} lần)")
+    if best < TARGET_PER_SECOND:
+        print(f"CHƯA ĐẠT mục tiêu {TARGET_PER_SECOND:,} chuỗi/giây")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import BTMC  # noqa: E402
+
+
+@pytest.fixture
+def btmc(tmp_path, monkeypatch):
+    # Mỗi test dùng file lịch sử/sự kiện riêng và các bộ nhớ đệm mới
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(BTMC, "HISTORY_FILE", str(tmp_path / "history.json"))
+    monkeypatch.setattr(BTMC, "current_gold_data", [])
+    monkeypatch.setattr(BTMC, "series_cache", BTMC.SeriesCache())
+    monkeypatch.setattr(BTMC, "rolling_stats", BTMC.RollingStats())
+    monkeypatch.setattr(BTMC, "event_log", BTMC.EventLog(str(tmp_path / "events.jsonl")))
+    monkeypatch.setattr(BTMC, "crawl_cache", BTMC.make_crawl_cache("memory"))
+    return BTMC
+
+
+@pytest.fixture
+def client(btmc):
+    return btmc.app.test_client()
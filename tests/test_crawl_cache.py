@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+
+class FakeRedis:
+    # Client tối giản có get/set(ex=) giống redis-py
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+
+def slow_fetch(calls):
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return [{"type": "Giá vàng Miếng", "timestamp": 1.0}]
+    return fetch
+
+
+@pytest.mark.parametrize("make_backend", [
+    lambda btmc, tmp_path: btmc.MemoryCacheBackend(),
+    lambda btmc, tmp_path: btmc.FileCacheBackend(str(tmp_path / "cache.json")),
+    lambda btmc, tmp_path: btmc.RedisCacheBackend(FakeRedis()),
+])
+def test_concurrent_callers_share_one_fetch(btmc, tmp_path, make_backend):
+    cache = btmc.CrawlCache(make_backend(btmc, tmp_path), ttl=60)
+    calls = []
+    threads = [threading.Thread(target=cache.get_or_fetch, args=("BTMC", slow_fetch(calls))) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cache.get_or_fetch("BTMC", slow_fetch(calls))
+
+    stats = cache.get_stats()
+    assert len(calls) == 1
+    assert stats["misses"] == 1
+    assert stats["coalesced"] + stats["hits"] == 10
+
+
+def test_error_is_shared_by_waiting_callers(btmc):
+    cache = btmc.make_crawl_cache("memory", ttl=60)
+    errors = []
+
+    def fetch():
+        time.sleep(0.1)
+        raise ValueError("upstream")
+
+    def call():
+        try:
+            cache.get_or_fetch("BTMC", fetch)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(errors) == 5
+    assert cache.get_stats()["errors"] == 1
+
+
+class DownRedis(FakeRedis):
+    def set(self, key, value, ex=None):
+        raise ConnectionError("redis down")
+
+
+def test_backend_write_failure_still_returns_data(btmc):
+    cache = btmc.CrawlCache(btmc.RedisCacheBackend(DownRedis()), ttl=60)
+    calls = []
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("BTMC", slow_fetch(calls))))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert results == [[{"type": "Giá vàng Miếng", "timestamp": 1.0}]] * 5
+    stats = cache.get_stats()
+    assert stats["errors"] == 0
+    assert stats["writeErrors"] == 1
+
+
+def test_expired_entry_is_refetched(btmc):
+    cache = btmc.make_crawl_cache("memory", ttl=0)
+    calls = []
+    cache.get_or_fetch("BTMC", lambda: calls.append(1) or [])
+    cache.get_or_fetch("BTMC", lambda: calls.append(1) or [])
+    assert len(calls) == 2
+
+
+def test_unknown_backend_is_rejected(btmc):
+    with pytest.raises(ValueError):
+        btmc.make_crawl_cache("redsi")
@@ -0,0 +1,317 @@
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_HTML = """
+<html><body>
+<div class="gold-price-box">
+  <div class="row">
+    <div class="col-6"><span class="gold-price-label">Mua vào</span><span class="gold-price">133.100</span></div>
+    <div class="col-6"><span class="gold-price-label">Bán ra</span><span class="gold-price">135.100</span></div>
+  </div>
+</div>
+</body></html>
+"""
+
+# Process worker: thêm các shard giả cùng cào BTMC_URL rồi chạy vòng lặp worker thật
+WORKER_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import BTMC
+for i in range(1, int(sys.argv[2])):
+    BTMC.DEALER_SOURCES[f"BTMC-{i}"] = BTMC.crawl_btmc
+BTMC.CrawlWorker(BTMC.CrawlJobStore()).run()
+"""
+
+
+class StandInServer:
+    # Máy chủ thay thế trang nguồn; hold_first=True giữ request đầu tiên cho tới khi đóng server
+    def __init__(self, hold_first=False):
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+        self.hold_first = hold_first
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with owner.lock:
+                    owner.requests += 1
+                    number = owner.requests
+                if owner.hold_first and number == 1:
+                    owner.release.wait()
+                body = SAMPLE_HTML.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                # Worker bị kill giữa chừng làm đứt kết nối, không cần in traceback
+                pass
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def farm(tmp_path):
+    servers = []
+    workers = []
+
+    def start_server(**kwargs):
+        server = StandInServer(**kwargs)
+        servers.append(server)
+        return server
+
+    def start_worker(server, shards=1, **env_overrides):
+        env = dict(os.environ)
+        env.update({
+            "CRAWL_MODE": "farm",
+            "BTMC_URL": server.url,
+            "FARM_DB_FILE": str(tmp_path / "farm.db"),
+            "CRAWL_CACHE_FILE": str(tmp_path / "crawl_cache.json"),
+            "FARM_POLL_SECONDS": "0.1",
+        })
+        env.update(env_overrides)
+        process = subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT, REPO_DIR, str(shards)],
+                                   cwd=tmp_path, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        workers.append(process)
+        return process
+
+    yield start_server, start_worker, str(tmp_path / "farm.db")
+
+    for process in workers:
+        if process.poll() is None:
+            process.terminate()
+        process.wait(timeout=10)
+    for server in servers:
+        server.close()
+
+
+def job_status(btmc, db_file):
+    if not os.path.exists(db_file):
+        return {}
+    try:
+        return {job["shard"]: job for job in btmc.CrawlJobStore(db_file).get_status()["jobs"]}
+    except sqlite3.OperationalError:
+        return {}
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_workers_run_each_shard_exactly_once(btmc, farm):
+    start_server, start_worker, db_file = farm
+    server = start_server()
+    shards = 6
+    for _ in range(4):
+        start_worker(server, shards)
+
+    assert wait_for(lambda: len(job_status(btmc, db_file)) == shards
+                    and all(job["runs"] >= 1 for job in job_status(btmc, db_file).values()))
+    # Chờ thêm vài vòng poll để lộ ra nếu có shard bị chạy lặp
+    time.sleep(1)
+
+    jobs = job_status(btmc, db_file)
+    assert sorted(jobs) == sorted(["BTMC"] + [f"BTMC-{i}" for i in range(1, shards)])
+    for job in jobs.values():
+        assert job["runs"] == 1
+        assert job["lastError"] is None
+        assert job["leaseOwner"] is None
+    assert server.requests == shards
+
+
+def test_expired_lease_is_taken_over(btmc, farm):
+    start_server, start_worker, db_file = farm
+    server = start_server(hold_first=True)
+    lease_env = {"FARM_LEASE_SECONDS": "2", "FARM_HEARTBEAT_SECONDS": "1"}
+
+    # Worker đầu tiên nhận lease rồi bị kill khi đang chờ trang nguồn
+    first = start_worker(server, **lease_env)
+    assert wait_for(lambda: server.requests == 1)
+    owner = job_status(btmc, db_file)["BTMC"]["leaseOwner"]
+    assert owner is not None
+    first.send_signal(signal.SIGKILL)
+    first.wait(timeout=10)
+
+    start_worker(server, **lease_env)
+    assert wait_for(lambda: job_status(btmc, db_file)["BTMC"]["runs"] == 1)
+
+    job = job_status(btmc, db_file)["BTMC"]
+    assert job["lastError"] is None
+    assert job["leaseOwner"] is None
+    assert server.requests == 2
+
+
+def test_farm_mode_rejects_memory_backend(btmc):
+    with pytest.raises(ValueError):
+        btmc.make_crawl_cache("memory", mode="farm")
+
+
+def test_transaction_reports_locked_database(btmc, tmp_path):
+    class NoWaitStore(btmc.CrawlJobStore):
+        def _connect(self):
+            return sqlite3.connect(self.path, timeout=0, isolation_level=None)
+
+    store = NoWaitStore(str(tmp_path / "farm.db"))
+    holder = sqlite3.connect(store.path, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            with store.transaction():
+                pass
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+
+def test_worker_survives_store_errors(btmc, tmp_path, monkeypatch):
+    store = btmc.CrawlJobStore(str(tmp_path / "farm.db"))
+    worker = btmc.CrawlWorker(store, sources={"BTMC": lambda: []}, update_function=lambda data: None,
+                              poll_seconds=0.01)
+    calls = []
+    original = store.try_acquire_leadership
+
+    def flaky(owner, now):
+        calls.append(1)
+        if len(calls) <= 2:
+            raise sqlite3.OperationalError("database is locked")
+        if store.get_status()["jobs"] and store.get_status()["jobs"][0]["runs"]:
+            worker.stop()
+        return original(owner, now)
+
+    monkeypatch.setattr(store, "try_acquire_leadership", flaky)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert store.get_status()["jobs"][0]["runs"] == 1
+
+
+def test_complete_job_failure_is_logged_not_raised(btmc, tmp_path, monkeypatch):
+    store = btmc.CrawlJobStore(str(tmp_path / "farm.db"))
+    worker = btmc.CrawlWorker(store, sources={"BTMC": lambda: []}, update_function=lambda data: None)
+
+    def broken(*args, **kwargs):
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(store, "complete_job", broken)
+    assert worker.run_once() is True
+    # Lease vẫn còn để hết hạn và được worker khác nhận lại
+    assert store.get_status()["jobs"][0]["leaseOwner"] == worker.worker_id
+
+
+def test_index_rereads_cache_in_farm_mode(btmc, client, monkeypatch):
+    monkeypatch.setattr(btmc, "CRAWL_MODE", "farm")
+    monkeypatch.setattr(btmc, "crawl_cache", btmc.make_crawl_cache("file", ttl=0, mode="farm"))
+
+    def no_crawl():
+        raise AssertionError("web không được tự cào ở chế độ farm")
+
+    monkeypatch.setattr(btmc, "crawl_btmc", no_crawl)
+
+    btmc.crawl_cache.set(btmc.CRAWL_CACHE_KEY, [btmc.GoldRecord("BTMC", "Vàng đợt một", time.time(), 1, 2)])
+    assert "Vàng đợt một" in client.get("/").get_data(as_text=True)
+
+    # Worker ghi dữ liệu mới: request sau phải thấy ngay dù entry đã quá TTL
+    btmc.crawl_cache.set(btmc.CRAWL_CACHE_KEY, [btmc.GoldRecord("BTMC", "Vàng đợt hai", time.time(), 1, 2)])
+    page = client.get("/").get_data(as_text=True)
+    assert "Vàng đợt hai" in page
+    assert "Vàng đợt một" not in page
+
+
+def test_stalled_worker_does_not_persist_after_takeover(btmc, tmp_path):
+    store = btmc.CrawlJobStore(str(tmp_path / "farm.db"))
+    persisted = []
+    second_data = [btmc.GoldRecord("BTMC", "Giá vàng Miếng", time.time(), 2, 2)]
+    first_data = [btmc.GoldRecord("BTMC", "Giá vàng Miếng", time.time(), 1, 1)]
+    second = btmc.CrawlWorker(store, sources={"BTMC": lambda: second_data},
+                              update_function=persisted.append, worker_id="second")
+
+    def stalled_crawl():
+        # Worker đầu bị treo quá hạn lease, worker thứ hai nhận lại và cào xong trước
+        with store.transaction() as conn:
+            conn.execute("UPDATE crawl_jobs SET lease_expires = 0")
+        assert second.run_once() is True
+        return first_data
+
+    first = btmc.CrawlWorker(store, sources={"BTMC": stalled_crawl},
+                             update_function=persisted.append, worker_id="first")
+    assert first.run_once() is True
+
+    assert persisted == [second_data]
+    assert btmc.event_log.last_seq == 1
+    job = store.get_status()["jobs"][0]
+    assert job["runs"] == 1
+    assert job["leaseOwner"] is None
+
+
+def test_expired_lease_is_not_persisted(btmc, tmp_path):
+    store = btmc.CrawlJobStore(str(tmp_path / "farm.db"))
+    persisted = []
+
+    def slow_crawl():
+        with store.transaction() as conn:
+            conn.execute("UPDATE crawl_jobs SET lease_expires = 0")
+        return ["late"]
+
+    worker = btmc.CrawlWorker(store, sources={"BTMC": slow_crawl}, update_function=persisted.append)
+    worker.run_once()
+
+    assert persisted == []
+    job = store.get_status()["jobs"][0]
+    assert job["runs"] == 0
+    # Shard vẫn đến hạn để worker khác nhận lại khi lease hết hạn
+    assert store.lease_job("other", time.time()) == "BTMC"
+
+
+def test_heartbeat_survives_store_errors(btmc, tmp_path, monkeypatch):
+    monkeypatch.setattr(btmc, "FARM_HEARTBEAT_SECONDS", 0.01)
+    store = btmc.CrawlJobStore(str(tmp_path / "farm.db"))
+    beats = []
+    original = store.heartbeat
+
+    def flaky(shard, owner, now):
+        beats.append(1)
+        if len(beats) <= 2:
+            raise sqlite3.OperationalError("database is locked")
+        return original(shard, owner, now)
+
+    monkeypatch.setattr(store, "heartbeat", flaky)
+    worker = btmc.CrawlWorker(store, sources={"BTMC": lambda: time.sleep(0.3) or []},
+                              update_function=lambda data: None)
+    assert worker.run_once() is True
+
+    assert len(beats) > 3
+    assert store.get_status()["jobs"][0]["runs"] == 1
@@ -0,0 +1,115 @@
+import json
+
+
+def record(btmc, gold_type, buy, sell):
+    return btmc.GoldRecord("BTMC", gold_type, 1700000000.0, buy, sell)
+
+
+def test_diff_statuses_and_deltas(btmc):
+    previous = [record(btmc, "A", 100, 200), record(btmc, "B", 300, 400), record(btmc, "C", 500, 600),
+                record(btmc, "E", None, 700)]
+    current = [record(btmc, "A", 100, 200), record(btmc, "B", 310, 390), record(btmc, "D", 1, 2),
+               record(btmc, "E", 650, 700)]
+
+    diff = btmc.diff_snapshots(previous, current)
+    changes = {c["type"]: c for c in diff["changes"]}
+
+    assert diff["summary"] == {"new": 1, "changed": 2, "unchanged": 1, "removed": 1}
+    assert (changes["A"]["status"], changes["A"]["buyDelta"], changes["A"]["sellDelta"]) == ("unchanged", 0, 0)
+    assert (changes["B"]["status"], changes["B"]["buyDelta"], changes["B"]["sellDelta"]) == ("changed", 10, -10)
+    assert (changes["D"]["status"], changes["D"]["buyDelta"], changes["D"]["sellDelta"]) == ("new", None, None)
+    assert (changes["C"]["status"], changes["C"]["buy"], changes["C"]["sell"]) == ("removed", None, None)
+    # Giá cũ không có thì không tính được chênh lệch
+    assert (changes["E"]["status"], changes["E"]["buyDelta"], changes["E"]["sellDelta"]) == ("changed", None, 0)
+
+
+def test_diff_accepts_legacy_dicts(btmc):
+    previous = [record(btmc, "A", 100, 200).to_dict()]
+    diff = btmc.diff_snapshots(previous, [record(btmc, "A", 120, 200)])
+    assert diff["changes"][0]["buyDelta"] == 20
+
+
+def test_tails_events_appended_by_another_process(btmc, tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    reader = btmc.EventLog(path)
+    writer = btmc.EventLog(path)
+
+    writer.append({"source": "BTMC", "changes": [], "summary": {}})
+    writer.append({"source": "BTMC", "changes": [], "summary": {}})
+    assert [e["seq"] for e in reader.read_since(0)] == [1, 2]
+
+    # Số thứ tự tiếp tục sau các sự kiện process khác đã ghi
+    assert reader.append({"source": "BTMC", "changes": [], "summary": {}})["seq"] == 3
+    assert [e["seq"] for e in writer.read_since(2)] == [3]
+
+
+def test_partial_line_is_not_consumed(btmc, tmp_path):
+    path = tmp_path / "events.jsonl"
+    log = btmc.EventLog(str(path))
+    log.append({"source": "BTMC", "changes": [], "summary": {}})
+
+    line = json.dumps({"seq": 2, "timestamp": 1.0, "source": "BTMC", "changes": [], "summary": {}}) + "\n"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line[:10])
+    assert [e["seq"] for e in log.read_since(0)] == [1]
+
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line[10:])
+    assert [e["seq"] for e in log.read_since(0)] == [1, 2]
+
+
+def test_truncated_file_is_reread(btmc, tmp_path):
+    path = tmp_path / "events.jsonl"
+    log = btmc.EventLog(str(path))
+    for _ in range(3):
+        log.append({"source": "BTMC", "changes": [], "summary": {}})
+
+    path.write_text("")
+    other = btmc.EventLog(str(path))
+    other.append({"source": "BTMC", "changes": [], "summary": {"new": 1}})
+
+    events = log.read_since(0)
+    assert [e["summary"] for e in events] == [{"new": 1}]
+    # Số thứ tự không lùi sau khi file bị cắt ngắn
+    assert log.append({"source": "BTMC", "changes": [], "summary": {}})["seq"] > 3
+
+
+def test_read_since_older_than_memory_uses_bounded_file_scan(btmc, tmp_path):
+    path = tmp_path / "events.jsonl"
+    log = btmc.EventLog(str(path), max_memory=5, index_stride=4)
+    for i in range(50):
+        log.append({"source": "BTMC", "changes": [], "summary": {"i": i}})
+
+    assert [e["seq"] for e in log.read_since(3, limit=5)] == [4, 5, 6, 7, 8]
+    assert [e["seq"] for e in log.read_since(0, limit=100)] == list(range(1, 51))
+
+    # Làm hỏng 10 dòng đầu (giữ nguyên độ dài): nếu phải đọc lại từ đầu file sẽ lỗi giải mã UTF-8
+    lines = path.read_bytes().split(b"\n")
+    for i in range(10):
+        lines[i] = b"\xff" * len(lines[i])
+    path.write_bytes(b"\n".join(lines))
+    assert [e["seq"] for e in log.read_since(40, limit=3)] == [41, 42, 43]
+
+
+def test_previous_snapshot_survives_restart(btmc, tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    log = btmc.EventLog(path, max_memory=2)
+    btmc.record_snapshot("A", [record(btmc, "Giá vàng Miếng", 100, 200)], log)
+    for i in range(5):
+        btmc.record_snapshot("B", [record(btmc, "Giá vàng Nhẫn", i, i)], log)
+
+    # Sự kiện cuối của nguồn A đã rời khỏi bộ nhớ nhưng vẫn là mốc so sánh sau khi khởi động lại
+    restarted = btmc.EventLog(path, max_memory=2)
+    snapshot = restarted.last_snapshot("A")
+    assert [(r.type, r.buy, r.sell) for r in snapshot] == [("Giá vàng Miếng", 100, 200)]
+
+    event = btmc.record_snapshot("A", [record(btmc, "Giá vàng Miếng", 110, 200)], restarted)
+    assert event["summary"] == {"new": 0, "changed": 1, "unchanged": 0, "removed": 0}
+    assert event["changes"][0]["buyDelta"] == 10
+
+
+def test_removed_records_are_not_in_snapshot(btmc, tmp_path):
+    log = btmc.EventLog(str(tmp_path / "events.jsonl"))
+    btmc.record_snapshot("BTMC", [record(btmc, "A", 1, 2), record(btmc, "B", 3, 4)], log)
+    btmc.record_snapshot("BTMC", [record(btmc, "A", 1, 2)], log)
+    assert [r.type for r in log.last_snapshot("BTMC")] == ["A"]
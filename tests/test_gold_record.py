@@ -0,0 +1,33 @@
+import pytest
+
+
+def make_record(btmc):
+    return btmc.GoldRecord("BTMC", "Giá vàng Miếng", 1700000000.0, 133100000, 135100000)
+
+
+def test_equals_legacy_dict(btmc):
+    record = make_record(btmc)
+    assert record == record.to_dict()
+    assert record.to_dict() == record
+    assert record != dict(record.to_dict(), **{"Bán ra": 1})
+
+
+@pytest.mark.parametrize("other", [
+    {},
+    {"Mua vào": 133100000},
+    {"type": None, "timestamp": 1700000000.0},
+    {"type": "Giá vàng Miếng", "timestamp": 1700000000.0, "dealer": 1},
+    None,
+    "Giá vàng Miếng",
+])
+def test_not_equal_to_incompatible_values(btmc, other):
+    record = make_record(btmc)
+    assert not record == other
+    assert record != other
+    assert other != record
+
+
+def test_record_in_list_of_dicts(btmc):
+    record = make_record(btmc)
+    assert record not in [{}, {"type": "Giá vàng Nhẫn"}]
+    assert record in [{}, record.to_dict()]
@@ -0,0 +1,129 @@
+import math
+import random
+
+import pytest
+
+
+# Các trường hợp hồi quy: (chuỗi trên trang, giá VNĐ/lượng mong đợi)
+REGRESSION_CASES = [
+    ("133.100", 133100000),
+    ("133,100", 133100000),
+    ("133100", 133100000),
+    ("135.100 ", 135100000),
+    ("Giá 133.100 hôm nay", 133100000),
+    ("13.310.000 đ/lượng", 13310000),
+    ("13.310.000đ/chỉ", 133100000),
+    ("13.310.000 VNĐ", 13310000),
+    ("1.331 triệu", 1331000000),
+    ("1,331 triệu", 1331000),
+    ("1.5 triệu", 1500000),
+    ("1.331.500 nghìn", 1331500000),
+    ("133,1 triệu/lượng", 133100000),
+    ("13,31 triệu/chỉ", 133100000),
+    ("133.100 nghìn đồng/lượng", 133100000),
+    ("1.331,5 nghìn", 1331500),
+    ("1,331.5k", 1331500),
+    ("133.100 x1000đ/lượng", 133100000),
+    ("133.100 x 1.000 VNĐ/lượng", 133100000),
+    ("133.100 × 1000đ", 133100000),
+    ("133.100 1.000đ/lượng", 133100000),
+    ("133.100 VNĐ/lượng", 133100000),
+    ("133.100 chi nhánh HN", 133100000),
+    ("133.100 trong ngày", 133100000),
+    ("133.100.", 133100000),
+    ("999,999", 999999000),
+    ("1,000,000", 1000000000),
+    ("999.999 đ", 999999000),
+    ("1.000.000 đ", 1000000),
+    ("", None),
+    ("N/A", None),
+    ("Liên hệ", None),
+    ("...", None),
+    ("²", None),
+    ("٣٣", None),
+    ("１２３", None),
+    ("1" * 400, None),
+    ("1" * 400 + " đ", None),
+    ("1 x" + "9" * 400, None),
+    ("0 x" + "9" * 400, None),
+    ("1 x1.2.3,4,5", None),
+]
+
+
+@pytest.mark.parametrize("text, expected", REGRESSION_CASES)
+def test_regression_cases(btmc, text, expected):
+    assert btmc.normalize_price(text) == expected
+
+
+def test_decomposed_unicode_units(btmc):
+    import unicodedata
+    assert btmc.normalize_price(unicodedata.normalize("NFD", "1,331 triệu/chỉ")) == 13310000
+
+
+def group(n, sep):
+    return f"{n:,}".replace(",", sep)
+
+
+def price_formats(n):
+    # Các cách viết khác nhau của cùng một giá n nghìn đồng/lượng
+    return [
+        group(n, "."),
+        group(n, ","),
+        str(n),
+        f"{group(n, '.')} nghìn đồng/lượng",
+        f"{group(n, ',')}k",
+        f"{group(n, '.')} x1000đ/lượng",
+        f"{group(n * 1000, '.')} đ/lượng",
+        f"{group(n * 100, '.')}đ/chỉ",
+        f"Giá bán: {group(n, '.')} (x1000đ/lượng)",
+    ]
+
+
+def test_fuzz_equivalent_formats(btmc):
+    rng = random.Random(2025)
+    for _ in range(5000):
+        n = rng.randint(1000, 999999)
+        for text in price_formats(n):
+            assert btmc.normalize_price(text) == n * 1000, text
+
+
+def test_fuzz_million_units(btmc):
+    # "," là dấu thập phân, "." là phân cách hàng nghìn, kể cả khi đơn vị là triệu
+    rng = random.Random(7)
+    for _ in range(5000):
+        n = rng.randint(1, 999999)
+        unit = rng.choice([" triệu", "tr", " trieu"])
+        assert btmc.normalize_price(f"{n / 1000:.3f}".replace(".", ",") + unit) == pytest.approx(n * 1000)
+        assert btmc.normalize_price(group(n, ".") + unit) == n * 1000000
+
+
+def test_fuzz_unitless_is_monotonic(btmc):
+    rng = random.Random(11)
+    for _ in range(5000):
+        n = rng.randint(1, 10 ** 9)
+        sep = rng.choice([".", ","])
+        assert btmc.normalize_price(group(n, sep)) < btmc.normalize_price(group(n + 1, sep))
+
+
+def test_fuzz_random_text_never_raises(btmc):
+    rng = random.Random(3)
+    # Gồm cả chữ số Unicode mà str.isdigit() chấp nhận nhưng float() không đọc được
+    alphabet = "0123456789.,  x×/đĐchỉlượngtriệunghìnkVNDabc\t²³¹⁴٣١０９"
+    for _ in range(50000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20)))
+        value = btmc.normalize_price(text)
+        assert value is None or (math.isfinite(value) and value >= 0), text
+
+
+def test_fuzz_overlong_numbers_never_raise(btmc):
+    rng = random.Random(5)
+    for _ in range(2000):
+        digits = "".join(rng.choice("0123456789") for _ in range(rng.randint(300, 400)))
+        text = rng.choice(["", "x"]) + digits + rng.choice(["", ".000", ",5", " triệu", " đ/chỉ"])
+        value = btmc.normalize_price(text)
+        assert value is None or (math.isfinite(value) and value >= 0), text
+
+
+def test_parse_price_from_text_keeps_none_for_empty(btmc):
+    assert btmc.parse_price_from_text(None) is None
+    assert btmc.parse_price_from_text("") is None
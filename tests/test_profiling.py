@@ -0,0 +1,114 @@
+import collections
+import os
+import re
+import time
+
+import pytest
+
+FOLDED_LINE = re.compile(r"^[^\n;]+(;[^\n;]+)* \d+$")
+
+
+@pytest.fixture
+def profiling(btmc, tmp_path, monkeypatch):
+    directory = tmp_path / "profiles"
+    monkeypatch.setattr(btmc, "PROFILE_ENABLED", True)
+    monkeypatch.setattr(btmc, "PROFILE_DIR", str(directory))
+    monkeypatch.setattr(btmc, "PROFILE_THRESHOLD_MS", 0)
+    monkeypatch.setattr(btmc, "PROFILE_CPROFILE_RATE", 0)
+    monkeypatch.setattr(btmc, "PROFILE_MAX_PER_MINUTE", 1000)
+    monkeypatch.setattr(btmc, "PROFILE_MAX_FILES", 1000)
+    monkeypatch.setattr(btmc, "_profile_writes", collections.deque())
+    return directory
+
+
+def folded_files(directory):
+    if not directory.exists():
+        return []
+    return sorted(p for p in directory.iterdir() if p.suffix == ".folded")
+
+
+def read_folded(path):
+    lines = path.read_text(encoding="utf-8").splitlines()
+    for line in lines:
+        assert FOLDED_LINE.match(line), line
+    return {line.rsplit(" ", 1)[0]: int(line.rsplit(" ", 1)[1]) for line in lines}
+
+
+def test_span_without_trace_is_noop(btmc):
+    with btmc.span("crawl"):
+        pass
+    assert btmc._current_trace.get() is None
+
+
+def test_nested_spans_write_self_time(btmc, profiling):
+    start = time.perf_counter()
+    with btmc.traced("job", "fetch"):
+        with btmc.span("crawl"):
+            time.sleep(0.02)
+            with btmc.span("parse"):
+                time.sleep(0.02)
+        with btmc.span("persist"):
+            time.sleep(0.01)
+    total_us = (time.perf_counter() - start) * 1000000
+
+    files = folded_files(profiling)
+    assert len(files) == 1
+    stacks = read_folded(files[0])
+    assert set(stacks) <= {"fetch", "fetch;crawl", "fetch;crawl;parse", "fetch;persist"}
+    assert stacks["fetch;crawl;parse"] >= 20000
+    # Thời gian riêng của crawl không tính span con parse
+    assert 20000 <= stacks["fetch;crawl"] < 40000
+    assert stacks["fetch;persist"] >= 10000
+    assert sum(stacks.values()) <= total_us
+
+
+def test_fast_trace_below_threshold_is_not_written(btmc, profiling, monkeypatch):
+    monkeypatch.setattr(btmc, "PROFILE_THRESHOLD_MS", 10000)
+    with btmc.traced("job", "fetch"):
+        with btmc.span("crawl"):
+            pass
+    assert folded_files(profiling) == []
+
+
+def test_disabled_profiling_does_not_trace(btmc, profiling, monkeypatch):
+    monkeypatch.setattr(btmc, "PROFILE_ENABLED", False)
+    with btmc.traced("job", "fetch"):
+        assert btmc._current_trace.get() is None
+    assert folded_files(profiling) == []
+
+
+def test_request_path_is_escaped(btmc, client, profiling):
+    client.get("/api/events%0Aevil;frame%0D%09x")
+    files = folded_files(profiling)
+    assert len(files) == 1
+    stacks = read_folded(files[0])
+    assert all(stack.startswith("GET /api/events\\x0aevil:frame\\x0d\\x09x") for stack in stacks)
+
+
+def test_writes_are_rate_limited(btmc, profiling, monkeypatch):
+    monkeypatch.setattr(btmc, "PROFILE_MAX_PER_MINUTE", 2)
+    for _ in range(5):
+        with btmc.traced("job", "fetch"):
+            pass
+    assert len(folded_files(profiling)) == 2
+
+    # Hết cửa sổ 60 giây thì được ghi tiếp
+    monkeypatch.setattr(btmc, "_profile_writes", collections.deque(t - 61 for t in btmc._profile_writes))
+    with btmc.traced("job", "fetch"):
+        pass
+    assert len(folded_files(profiling)) == 3
+
+
+def test_oldest_files_are_pruned(btmc, profiling, monkeypatch):
+    monkeypatch.setattr(btmc, "PROFILE_MAX_FILES", 3)
+    for i in range(6):
+        with btmc.traced("job", f"fetch-{i}"):
+            pass
+        # mtime khác nhau để thứ tự cũ/mới rõ ràng
+        for path in folded_files(profiling):
+            os.utime(path, (path.stat().st_mtime - 1, path.stat().st_mtime - 1))
+
+    files = folded_files(profiling)
+    assert len(files) == 3
+    names = {next(iter(read_folded(p))) for p in files}
+    assert names == {"fetch-3", "fetch-4", "fetch-5"}
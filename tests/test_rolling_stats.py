@@ -0,0 +1,137 @@
+import random
+import statistics
+import time
+
+import pytest
+
+TYPES = ("Giá vàng Miếng", "Giá vàng Nhẫn")
+
+
+def make_records(btmc, start, end, step=600, seed=1):
+    # Giá đi ngẫu nhiên quanh 1e8, thỉnh thoảng thiếu giá mua; lệch 37 giây để không trùng biên cửa sổ
+    rng = random.Random(seed)
+    prices = {t: 133e6 for t in TYPES}
+    records = []
+    timestamp = start
+    while timestamp <= end:
+        for gold_type in TYPES:
+            prices[gold_type] += rng.randint(-500000, 500000)
+            buy = None if rng.random() < 0.05 else prices[gold_type]
+            records.append(btmc.GoldRecord("BTMC", gold_type, timestamp - 37, buy, prices[gold_type] + 2e6))
+        timestamp += step
+    return records
+
+
+def feed(btmc, records, batch=100):
+    for i in range(0, len(records), batch):
+        btmc.update_history(records[i:i + batch])
+
+
+def brute_force(btmc, history, now):
+    result = {}
+    for gold_type in {r.type for r in history}:
+        for field in btmc.PRICE_KEYS:
+            series = [(r.timestamp, getattr(r, field)) for r in history
+                      if r.type == gold_type and getattr(r, field) is not None]
+            if not series:
+                continue
+            for name, seconds in btmc.STATS_WINDOWS.items():
+                values = [v for t, v in series if t >= now - seconds]
+                if not values:
+                    stats = None
+                else:
+                    average = statistics.fmean(values)
+                    stdev = statistics.pstdev(values)
+                    stats = {"count": len(values), "high": max(values), "low": min(values),
+                             "average": average, "stdev": stdev, "volatility": stdev / average * 100}
+                result.setdefault(gold_type, {}).setdefault(field, {})[name] = stats
+    return result
+
+
+def assert_matches(actual, expected):
+    assert actual.keys() == expected.keys()
+    for gold_type in expected:
+        assert actual[gold_type].keys() == expected[gold_type].keys()
+        for field in expected[gold_type]:
+            for name, want in expected[gold_type][field].items():
+                got = actual[gold_type][field][name]
+                if want is None:
+                    assert got is None, (gold_type, field, name)
+                    continue
+                assert (got["count"], got["high"], got["low"]) == (want["count"], want["high"], want["low"])
+                assert got["average"] == pytest.approx(want["average"], abs=0.01)
+                assert got["stdev"] == pytest.approx(want["stdev"], abs=0.01)
+                assert got["volatility"] == pytest.approx(want["volatility"], abs=0.001)
+
+
+@pytest.fixture
+def rebuilds(btmc, monkeypatch):
+    calls = []
+    original = btmc.RollingStats._rebuild
+
+    def counting(self, history):
+        calls.append(len(history))
+        return original(self, history)
+
+    monkeypatch.setattr(btmc.RollingStats, "_rebuild", counting)
+    return calls
+
+
+def test_incremental_updates_match_brute_force(btmc, client, rebuilds):
+    now = time.time()
+    feed(btmc, make_records(btmc, now - 8 * 86400, now))
+
+    stats = btmc.rolling_stats.get()
+    assert_matches(stats, brute_force(btmc, btmc.load_history(), time.time()))
+    # Chỉ lần cập nhật đầu dựng lại, các lần sau cộng dồn
+    assert len(rebuilds) == 1
+
+    api = client.get("/api/stats").get_json()
+    assert api["statusCode"] == 200
+    assert_matches(api["data"], brute_force(btmc, btmc.load_history(), time.time()))
+
+
+def test_windows_expire_when_read_later(btmc, rebuilds):
+    now = time.time()
+    records = make_records(btmc, now - 8 * 86400, now - 20 * 3600)
+    # Loại thứ hai ngừng cập nhật từ 2 ngày trước: cửa sổ 24h phải rỗng
+    records = [r for r in records if r.type == TYPES[0] or r.timestamp < now - 2 * 86400]
+    feed(btmc, records)
+
+    stats = btmc.rolling_stats.get()
+    assert_matches(stats, brute_force(btmc, btmc.load_history(), time.time()))
+    assert stats[TYPES[1]]["sell"]["24h"] is None
+    assert stats[TYPES[0]]["sell"]["24h"]["count"] < stats[TYPES[0]]["sell"]["7d"]["count"]
+    assert len(rebuilds) == 1
+
+
+def test_rebuilds_after_history_file_changes_elsewhere(btmc, rebuilds):
+    now = time.time()
+    feed(btmc, make_records(btmc, now - 3 * 86400, now))
+    btmc.rolling_stats.get()
+    assert len(rebuilds) == 1
+
+    # Process khác ghi lại file lịch sử với dữ liệu khác
+    rewritten = make_records(btmc, now - 5 * 86400, now - 3600, step=900, seed=2)
+    btmc.save_history(rewritten)
+
+    stats = btmc.rolling_stats.get()
+    assert len(rebuilds) == 2
+    assert_matches(stats, brute_force(btmc, btmc.load_history(), time.time()))
+
+    # Sau khi dựng lại, cập nhật tiếp theo quay về đường cộng dồn
+    btmc.update_history([btmc.GoldRecord("BTMC", TYPES[0], time.time(), 150e6, 152e6)])
+    stats = btmc.rolling_stats.get()
+    assert len(rebuilds) == 2
+    assert_matches(stats, brute_force(btmc, btmc.load_history(), time.time()))
+    assert stats[TYPES[0]]["buy"]["24h"]["high"] == 150e6
+
+
+def test_large_prices_keep_precision(btmc):
+    window = btmc.RollingWindow(3600)
+    values = [133100000 + (i % 3) for i in range(10000)]
+    for i, value in enumerate(values):
+        window.add(i * 0.1, value)
+    snapshot = window.snapshot()
+    assert snapshot["stdev"] == pytest.approx(statistics.pstdev(values), abs=0.01)
+    assert snapshot["average"] == pytest.approx(statistics.fmean(values), abs=0.01)
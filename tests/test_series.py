@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+
+def make_history(btmc, count, step=60):
+    now = time.time()
+    return [btmc.GoldRecord("BTMC", "Giá vàng Miếng", now - (count - i) * step, 133e6 + i, 135e6 + i)
+            for i in range(count)]
+
+
+def test_lttb_keeps_endpoints_and_budget(btmc):
+    points = [(i, (i * 7919) % 101) for i in range(5000)]
+    sampled = btmc.lttb_downsample(points, 250)
+    assert len(sampled) == 250
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert all(a[0] < b[0] for a, b in zip(sampled, sampled[1:]))
+
+
+@pytest.mark.parametrize("requested, expected", [(1, 100), (100, 100), (799, 500), (1200, 1000), (10 ** 6, 2000)])
+def test_point_budget_is_bounded(btmc, requested, expected):
+    assert btmc.pick_point_budget(requested) == expected
+
+
+def test_named_range_is_precomputed_once(btmc, client, monkeypatch):
+    btmc.save_history(make_history(btmc, 3000))
+    loads = []
+    original = btmc.load_history
+    monkeypatch.setattr(btmc, "load_history", lambda: loads.append(1) or original())
+
+    for width in (600, 700, 999):
+        data = client.get("/api/series", query_string={"type": "Giá vàng Miếng", "range": "24h",
+                                                       "max_points": width}).get_json()["data"]
+        assert data["maxPoints"] == 500
+        assert len(data["buy"]) == 500
+    assert len(loads) == 1
+
+
+def test_update_history_refreshes_precomputed_series(btmc, client):
+    btmc.update_history(make_history(btmc, 1, step=300))
+    client.get("/api/series", query_string={"type": "Giá vàng Miếng", "range": "24h"})
+    btmc.update_history([btmc.GoldRecord("BTMC", "Giá vàng Miếng", time.time(), 1.0, 2.0)])
+    data = client.get("/api/series", query_string={"type": "Giá vàng Miếng", "range": "24h"}).get_json()["data"]
+    assert data["buy"][-1][1] == 1.0
+
+
+@pytest.mark.parametrize("query", [{"from": "nan"}, {"to": "inf"}, {"from": "-inf"}, {"from": "abc"},
+                                   {"range": "1y"}, {"from": "10", "to": "5"}, {"type": ""}])
+def test_invalid_parameters_return_400(btmc, client, query):
+    params = {"type": "Giá vàng Miếng"}
+    params.update(query)
+    response = client.get("/api/series", query_string=params)
+    assert response.status_code == 400
+
+
+def test_custom_range_is_downsampled(btmc, client):
+    history = make_history(btmc, 3000)
+    btmc.save_history(history)
+    response = client.get("/api/series", query_string={"type": "Giá vàng Miếng", "from": history[0].timestamp,
+                                                       "to": history[-1].timestamp, "max_points": 250})
+    assert response.status_code == 200
+    assert len(response.get_json()["data"]["sell"]) == 250